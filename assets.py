@@ -0,0 +1,197 @@
+"""
+This module builds and serves the static assets.
+    `flask build-assets` concatenates and minifies the CSS and JS bundles listed in BUNDLES, copies
+    every other static file, and writes all of them to static/dist/ under content-hashed names
+    (main.3f2a9c1b7d4e.css) with .gz and, when the brotli package is installed, .br variants.
+    static/dist/manifest.json maps each bundle or file name to its hashed name.
+    In the templates, asset_url('img/front-splash.jpg') takes the same filename as
+    url_for('static', filename=...) and bundle_urls('main.css') lists the URLs of a bundle.
+    Without a build they fall back to the original files, so development needs no build step.
+    Hashed files never change, so they are served with Cache-Control: immutable, in the
+    precompressed encoding the client accepts.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import abort, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+
+# Bundle name -> source files under static/, in load order
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'main.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+# Files served precompressed. Images and fonts are already compressed.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.json', '.txt', '.html')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_manifests = {}
+
+
+def minify_css(text):
+    """Removes comments and needless whitespace from a stylesheet, using rcssmin when it is installed"""
+    try:
+        import rcssmin  # Optional dependency, minifies more safely
+        return rcssmin.cssmin(text)
+    except ImportError:
+        pass
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    # Spaces next to ':' are kept, they are significant in selectors such as "a :hover"
+    return re.sub(r'\s*([{};,>])\s*', r'\1', text).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Minifies a script with rjsmin when it is installed. Otherwise the script is left as is."""
+    try:
+        import rjsmin  # Optional dependency
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def _hashed_name(name, content):
+    root, ext = os.path.splitext(name)
+    return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def _write(dist, name, content, manifest):
+    hashed = _hashed_name(name, content)
+    path = os.path.join(dist, hashed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if name.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        try:
+            import brotli  # Optional dependency
+        except ImportError:
+            pass
+        else:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+    manifest[name] = hashed
+
+
+def build(static_folder, echo=print):
+    """
+        Builds the bundles and the hashed copies of the static files into static/dist/
+        ----
+        Args
+        ----
+            static_folder (string): The app static folder
+            echo (callable): Receives one line per written file
+        -------
+        Returns
+        -------
+            manifest (dict): Bundle or file name -> hashed name under static/dist/
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+        if name.endswith('.css'):
+            content = minify_css('\n'.join(parts))
+        else:
+            # A script may lack its final semicolon
+            content = ';\n'.join(minify_js(part) for part in parts)
+        _write(dist, name, content.encode(), manifest)
+        echo('%-40s %8d bytes' % (manifest[name], len(content)))
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                _write(dist, name, f.read(), manifest)
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _manifests.pop(static_folder, None)
+    return manifest
+
+
+def _manifest(app):
+    manifest = _manifests.get(app.static_folder)
+    if manifest is None:
+        try:
+            with open(os.path.join(app.static_folder, DIST_DIR, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        _manifests[app.static_folder] = manifest
+    return manifest
+
+
+def init_assets(app):
+    """
+        Adds asset_url and bundle_urls to the templates and the route serving static/dist/
+        ----
+        Args
+        ----
+            app (Flask): The Flask app
+    """
+    def asset_url(filename):
+        """url_for('static', filename=filename), pointing at the hashed copy when there is one"""
+        hashed = _manifest(app).get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def bundle_urls(bundle):
+        """The URL of a built bundle, or the URLs of its source files when it was not built"""
+        if bundle in _manifest(app):
+            return [asset_url(bundle)]
+        return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+    def serve_asset(filename):
+        if filename == MANIFEST:
+            abort(404)
+        dist = os.path.join(app.static_folder, DIST_DIR)
+        # The precompressed variants of one file differ, so caches must key them on Accept-Encoding
+        encodings = [('br', '.br'), ('gzip', '.gz')] if filename.endswith(COMPRESSIBLE) else []
+        for encoding, suffix in encodings:
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+                response = send_from_directory(dist, filename + suffix, 
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(dist, filename)
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    app.add_url_rule('/static/%s/<path:filename>' % DIST_DIR, 'assets', serve_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, bundle_urls=bundle_urls)
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Bundles, minifies, fingerprints and precompresses the static files."""
+    from flask import current_app
+
+    manifest = build(current_app.static_folder, echo=click.echo)
+    click.echo('Wrote %d files to %s' % (len(manifest), os.path.join(current_app.static_folder, DIST_DIR)))
@@ -0,0 +1,171 @@
+"""
+This module answers the type-ahead requests of the venue and artist search boxes from memory.
+    Each model has a PrefixIndex of names, built from the database on first use. The create, edit
+    and delete routes update it in place. The index also remembers the version stamps of its model
+    (see caching.py), which every process shares. When another worker or an import changes the
+    model, the stamps move and the index is rebuilt. Lookups read the stamps at most once every
+    AUTOCOMPLETE_STAMP_INTERVAL seconds, so a warm index answers without touching the database.
+"""
+
+from bisect import bisect_left, insort
+import re
+import threading
+import time
+
+import caching
+
+
+_space_pattern = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lowercases a name and collapses its whitespace"""
+    return _space_pattern.sub(' ', (text or '').lower()).strip()
+
+
+class PrefixIndex:
+    """
+        Two sorted lists of (key, id) pairs: one keyed by the whole name, one by the name from each
+        of its later words. Matches are found by bisecting to the prefix and reading forward, so a
+        lookup costs O(log n + limit). Names starting with the prefix rank before names with a later
+        word starting with it.
+    """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.checked_at = None  # time.monotonic() of the last read of the stamps
+        self.names = {}
+        self.starts = []
+        self.words = []
+        self._lock = threading.Lock()
+        for entity_id, name in rows:
+            self.names[entity_id] = name
+            start, words = self._keys(entity_id, name)
+            self.starts.append(start)
+            self.words.extend(words)
+        self.starts.sort()
+        self.words.sort()
+
+    @staticmethod
+    def _keys(entity_id, name):
+        key = normalize(name)
+        positions = [match.start() for match in re.finditer(' ', key)]
+        return (key, entity_id), [(key[position + 1:], entity_id) for position in positions]
+
+    def upsert(self, entity_id, name):
+        with self._lock:
+            self._remove(entity_id)
+            self.names[entity_id] = name
+            start, words = self._keys(entity_id, name)
+            insort(self.starts, start)
+            for word in words:
+                insort(self.words, word)
+
+    def remove(self, entity_id):
+        with self._lock:
+            self._remove(entity_id)
+
+    def _remove(self, entity_id):
+        name = self.names.pop(entity_id, None)
+        if name is None:
+            return
+        start, words = self._keys(entity_id, name)
+        for keys, key in [(self.starts, start)] + [(self.words, word) for word in words]:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def lookup(self, prefix, limit):
+        """
+            Finds the names starting with a prefix, or having a word that starts with it
+            ----
+            Args
+            ----
+                prefix (string): What the user typed so far
+                limit (int): The maximum number of results
+            -------
+            Returns
+            -------
+                results (list): Dictionaries with the id and name of each match
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            for keys in (self.starts, self.words):
+                i = bisect_left(keys, (prefix,))
+                while i < len(keys) and len(results) < limit and keys[i][0].startswith(prefix):
+                    entity_id = keys[i][1]
+                    if entity_id not in seen:
+                        seen.add(entity_id)
+                        results.append({'id': entity_id, 'name': self.names[entity_id]})
+                    i += 1
+        return results
+
+
+_indexes = {}
+_build_lock = threading.Lock()
+
+
+def _names(model):
+    return ['all', model.__tablename__]
+
+
+def _versions(cache, model):
+    return cache.versions(_names(model))
+
+
+def get_index(db, cache, model, check_interval=0):
+    """
+        Returns the prefix index of a model, building it when it is missing or out of date
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            cache (NullCache): The cache backend holding the version stamps
+            model (db.Model): The Venue or Artist model
+            check_interval (float): Seconds during which an index is used without reading the stamps again
+        -------
+        Returns
+        -------
+            index (PrefixIndex): The index of the model names
+    """
+    now = time.monotonic()
+    index = _indexes.get(model.__tablename__)
+    if index is not None and index.checked_at is not None and now - index.checked_at < check_interval:
+        return index
+    version = _versions(cache, model)
+    if index is None or index.version != version:
+        with _build_lock:
+            index = _indexes.get(model.__tablename__)
+            if index is None or index.version != version:
+                index = PrefixIndex(db.session.query(model.id, model.name), version)
+                _indexes[model.__tablename__] = index
+    index.checked_at = now
+    return index
+
+
+def name_changed(model, entity_id, name, bumped):
+    """A venue or artist was created or renamed. bumped is what the caching function of the write returned."""
+    index = _indexes.get(model.__tablename__)
+    if index is not None:
+        index.upsert(entity_id, name)
+        _carry_version(model, index, bumped)
+
+
+def removed(model, entity_id, bumped):
+    """A venue or artist was deleted. bumped is what the caching function of the write returned."""
+    index = _indexes.get(model.__tablename__)
+    if index is not None:
+        index.remove(entity_id)
+        _carry_version(model, index, bumped)
+
+
+def _carry_version(model, index, bumped):
+    version = caching.after_bump(index.version, _names(model), bumped)
+    if version is None:
+        # Another process changed the names since the index was built, so it misses that change
+        _indexes.pop(model.__tablename__, None)
+    else:
+        index.version = version
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the Fyyur read paths.
+    seed: fills a database with synthetic venues, artists and shows
+    run: times the helper_functions hot paths and the routes, and writes the results as JSON
+    compare: compares two result files and fails on regressions
+
+    Usage:
+        python -m benchmarks.run --shows 1000,10000 --output bench.json
+        python -m benchmarks.compare baseline.json bench.json
+"""
@@ -0,0 +1,54 @@
+"""
+Compares two benchmark result files written by benchmarks.run.
+
+    Usage: python -m benchmarks.compare BASELINE.json CURRENT.json [--threshold 1.25]
+
+    Exits with status 1 when a benchmark's median got slower than threshold x the baseline.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {(result['name'], result['shows']): result for result in report['results']}, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown ratio of the median considered a regression')
+    args = parser.parse_args(argv)
+
+    baseline, baseline_report = load(args.baseline)
+    current, current_report = load(args.current)
+    print('baseline %s -> current %s' % (baseline_report.get('commit'), current_report.get('commit')))
+
+    regressions = 0
+    for key in sorted(current):
+        name, shows = key
+        new = current[key]
+        old = baseline.get(key)
+        if old is None or 'median_ms' not in old or 'median_ms' not in new:
+            print('  %-45s %8d shows  %s' % (name, shows, new.get('error', 'no baseline')))
+            continue
+        ratio = new['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print('  %-45s %8d shows  %9.3f ms -> %9.3f ms  x%.2f%s' % (
+            name, shows, old['median_ms'], new['median_ms'], ratio, flag))
+
+    if regressions:
+        print('%d regression(s)' % regressions)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
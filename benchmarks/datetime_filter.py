@@ -0,0 +1,78 @@
+"""
+Compares the render time of the show tiles' dates with the former and the current 'datetime' filter.
+
+    Usage: python -m benchmarks.datetime_filter [--shows 10000] [--repeat 5]
+
+    former: the date went through strftime('%m/%d/%Y %H:%M') in the template, was parsed back by
+            dateutil and formatted by babel.dates.format_datetime
+    current (cold): formatting.format_datetime with its caches emptied before every run
+    current (warm): formatting.format_datetime with the caches left from the previous runs
+    No database is needed: the shows come from the benchmark data generator.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from jinja2 import Environment
+
+
+TEMPLATE = "{% for show in shows %}<h4>{{ SHOW_DATE|datetime('full') }}</h4>{% endfor %}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=10000, help='Number of show tiles on the page')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per variant')
+    return parser.parse_args(argv)
+
+
+def former_format_datetime(value, format='medium'):
+    import babel.dates
+    import dateutil.parser
+
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import formatting
+    from benchmarks.run import time_call
+    from benchmarks.seed import generate_shows
+
+    shows = list(generate_shows(random.Random(0), args.shows, venues=100, artists=100))
+
+    def template(filter_function, show_date):
+        environment = Environment()
+        environment.filters['datetime'] = filter_function
+        return environment.from_string(TEMPLATE.replace('SHOW_DATE', show_date))
+
+    former = template(former_format_datetime, "show.start_time.strftime('%m/%d/%Y %H:%M')")
+    current = template(formatting.format_datetime, 'show.start_time')
+
+    def cold():
+        formatting.clear_caches()
+        current.render(shows=shows)
+
+    assert former.render(shows=shows) == current.render(shows=shows)
+    results = {
+        'former': time_call(lambda: former.render(shows=shows), args.repeat),
+        'current (cold)': time_call(cold, args.repeat),
+        'current (warm)': time_call(lambda: current.render(shows=shows), args.repeat),
+    }
+    for name, result in results.items():
+        print('  %-20s %10.3f ms' % (name, result['median_ms']), file=sys.stderr)
+    print(json.dumps({'shows': args.shows, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Load-tests one worker of the app with scripted user journeys, at increasing concurrency.
+
+    Usage: python -m benchmarks.load [--shows 10000] [--concurrency 1,4,16,64] [--duration 20]
+                                     [--mix browse=4,artists=2,search=2,calendar=1,create_show=1]
+                                     [--database-url URL | --url http://host:port] [--output FILE]
+
+    The database at --database-url is DROPPED and seeded like benchmarks.run, then the app is
+    served by one Werkzeug process (threaded, debug off) on a free local port. Every virtual user
+    runs journeys picked at random with the --mix weights, back to back, for --duration seconds
+    per concurrency level. With --url the journeys run against a server that is already up (e.g.
+    gunicorn on a seeded database) and nothing is seeded or started.
+
+    The report gives, for every concurrency level, the throughput, the error rate and the p50, p95
+    and p99 latency overall and per route. Its 'results' list has the format of benchmarks.run
+    (one entry per route and level, the p50 as median_ms), so two reports can be compared with
+    benchmarks.compare.
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import gzip
+import json
+import math
+import os
+import platform
+import random
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = 'browse=4,artists=2,search=2,calendar=1,create_show=1'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=10000, help='Number of shows to seed')
+    parser.add_argument('--venues-per-show', type=float, default=0.05,
+                        help='Venues created per show (default 1 venue for 20 shows)')
+    parser.add_argument('--artists-per-show', type=float, default=0.1,
+                        help='Artists created per show (default 1 artist for 10 shows)')
+    parser.add_argument('--database-url', default='sqlite:///' + os.path.abspath('benchmark.db'),
+                        help='Scratch database to seed (it is wiped)')
+    parser.add_argument('--url', help='Load an already running server instead of seeding and starting one')
+    parser.add_argument('--cache', action='store_true', help='Keep the read-through cache on')
+    parser.add_argument('--concurrency', default='1,4,16,64',
+                        help='Comma separated numbers of virtual users, one stage per number')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per stage')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before the first stage, not reported')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Journey weights, name=weight, comma separated')
+    parser.add_argument('--think-time', type=float, default=0, help='Seconds a virtual user waits between requests')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the journey choices')
+    parser.add_argument('--output', default='-', help='Where to write the JSON report (- for stdout)')
+    # Internal: run the server on this port (the parent process starts it this way)
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+#  Virtual users
+#  ----------------------------------------------------------------
+
+class VirtualUser:
+    """One simulated visitor: it sends requests one at a time and records each of them"""
+
+    VENUE_LINK = re.compile(rb'/venues/(\d+)')
+    ARTIST_LINK = re.compile(rb'/artists/(\d+)')
+
+    def __init__(self, base_url, rng, record, think_time=0, timeout=30):
+        self.base_url = base_url
+        self.rng = rng
+        self.record = record
+        self.think_time = think_time
+        self.timeout = timeout
+        # IDs seen on the pages visited so far, used by the next journeys
+        self.venue_ids, self.artist_ids = [1], [1]
+
+    def request(self, route, path, data=None):
+        """Sends a GET (or a POST of the form data) and records its latency under the route name"""
+        body = urlencode(data).encode() if data is not None else None
+        request = Request(self.base_url + path, data=body, headers={'Accept-Encoding': 'gzip'})
+        start = time.perf_counter()
+        status, error, content = None, None, b''
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+                content = response.read()
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    content = gzip.decompress(content)
+        except HTTPError as e:
+            status, error = e.code, 'HTTP %d' % e.code
+        except (URLError, OSError) as e:
+            error = type(e).__name__
+        self.record(route, (time.perf_counter() - start) * 1000, status, error)
+
+        self._collect(self.VENUE_LINK, content, self.venue_ids)
+        self._collect(self.ARTIST_LINK, content, self.artist_ids)
+        if self.think_time:
+            time.sleep(self.think_time)
+        return content
+
+    @staticmethod
+    def _collect(pattern, content, ids):
+        found = {int(match) for match in pattern.findall(content)}
+        if found:
+            ids[:] = sorted(found)
+
+
+def journey_browse(user):
+    user.request('GET /venues', '/venues')
+    user.request('GET /venues/<id>', '/venues/%d' % user.rng.choice(user.venue_ids))
+
+
+def journey_artists(user):
+    user.request('GET /artists', '/artists')
+    user.request('GET /artists/<id>', '/artists/%d' % user.rng.choice(user.artist_ids))
+
+
+def journey_search(user):
+    from benchmarks.seed import ADJECTIVES, ARTIST_WORDS, VENUE_WORDS
+
+    term = user.rng.choice(ADJECTIVES).lower()
+    user.request('GET /venues/autocomplete', '/venues/autocomplete?' + urlencode({'q': term[:3]}))
+    user.request('POST /venues/search', '/venues/search',
+                 {'search_term': '%s %s' % (term, user.rng.choice(VENUE_WORDS).lower())})
+    user.request('POST /artists/search', '/artists/search', {'search_term': user.rng.choice(ARTIST_WORDS).lower()})
+
+
+def journey_calendar(user):
+    day = datetime.now().date() + timedelta(days=user.rng.randint(-60, 60))
+    user.request('GET /api/calendar/month', '/api/calendar/month?' + urlencode({'date': day.isoformat()}))
+    user.request('GET /calendar/week', '/calendar/week?' + urlencode({'date': day.isoformat()}))
+
+
+def journey_create_show(user):
+    user.request('GET /shows/create', '/shows/create')
+    # A random evening a few years ahead, so the new show rarely double-books a seeded one
+    start_time = datetime(2031, 1, 1, 18) + timedelta(days=user.rng.randrange(5 * 365), hours=user.rng.randint(0, 4))
+    user.request('POST /shows/create', '/shows/create', {
+        'venue_id': user.rng.choice(user.venue_ids),
+        'artist_id': user.rng.choice(user.artist_ids),
+        'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
+    })
+    user.request('GET /shows', '/shows')
+
+
+JOURNEYS = {
+    'browse': journey_browse,
+    'artists': journey_artists,
+    'search': journey_search,
+    'calendar': journey_calendar,
+    'create_show': journey_create_show,
+}
+
+
+def parse_mix(mix):
+    """Reads 'name=weight,...' into a list of (journey name, weight)"""
+    weights = []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in JOURNEYS:
+            raise SystemExit('Unknown journey %r, expected one of %s' % (name, ', '.join(JOURNEYS)))
+        weights.append((name, float(weight or 1)))
+    return weights
+
+
+#  Load stages and the report
+#  ----------------------------------------------------------------
+
+def percentile(samples, p):
+    """The nearest-rank percentile of sorted samples"""
+    if not samples:
+        return None
+    return round(samples[max(0, math.ceil(p / 100 * len(samples)) - 1)], 3)
+
+
+def summarize(records, seconds):
+    """Counts, throughput, error rate and latency percentiles of (latency_ms, status, error) records"""
+    latencies = sorted(latency for latency, _, _ in records)
+    errors = sum(1 for _, _, error in records if error)
+    return {
+        'requests': len(records),
+        'errors': errors,
+        'error_rate': round(errors / len(records), 4) if records else 0,
+        'throughput_rps': round(len(records) / seconds, 2) if seconds else 0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': round(latencies[-1], 3) if latencies else None,
+    }
+
+
+def run_stage(base_url, concurrency, duration, mix, seed, think_time=0, timeout=30):
+    """
+        Runs virtual users against the server for a while
+        ----
+        Args
+        ----
+            base_url (string): The server, e.g. http://127.0.0.1:5000
+            concurrency (int): Number of virtual users, each in its own thread
+            duration (float): Seconds of load
+            mix (list): (journey name, weight) pairs
+            seed (int): Seed of the journey choices
+            think_time (float): Seconds a virtual user waits between requests
+            timeout (float): Seconds before a request counts as failed
+        -------
+        Returns
+        -------
+            records (dict), seconds (float): The (latency_ms, status, error) records by route, and the
+                actual length of the stage
+    """
+    records = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = zip(*mix)
+
+    def record(route, latency_ms, status, error):
+        with lock:
+            records.setdefault(route, []).append((latency_ms, status, error))
+
+    def run_user(number):
+        user = VirtualUser(base_url, random.Random('%d:%d:%d' % (seed, concurrency, number)), record,
+                           think_time=think_time, timeout=timeout)
+        while time.perf_counter() < deadline:
+            JOURNEYS[user.rng.choices(names, weights)[0]](user)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_user, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - start
+
+
+def stage_report(concurrency, records, seconds, shows):
+    """The summary of a stage and its benchmarks.run style results"""
+    every_record = [record for route_records in records.values() for record in route_records]
+    stage = {'concurrency': concurrency, 'seconds': round(seconds, 3), **summarize(every_record, seconds), 'routes': {}}
+    results = []
+    for route in sorted(records):
+        summary = summarize(records[route], seconds)
+        stage['routes'][route] = summary
+        results.append({
+            'name': 'load c=%d: %s' % (concurrency, route),
+            'shows': shows,
+            'runs': summary['requests'],
+            'median_ms': summary['p50_ms'],
+            'p95_ms': summary['p95_ms'],
+            'p99_ms': summary['p99_ms'],
+            'throughput_rps': summary['throughput_rps'],
+            'error_rate': summary['error_rate'],
+        })
+    return stage, results
+
+
+#  The server
+#  ----------------------------------------------------------------
+
+def serve(port):
+    """Serves the app on the port with one threaded Werkzeug process, until it is killed"""
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import make_server
+
+    from settings import create_app
+
+    app = create_app(cli=False)
+    # The form templates do not render CSRF tokens, so the scripted POSTs go without (like benchmarks.run)
+    app.config['WTF_CSRF_ENABLED'] = False
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, log_dir):
+    """Starts `python -m benchmarks.load --serve PORT` and waits until it answers"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=args.database_url, DEBUG='0', SECRET_KEY=secrets.token_hex(32),
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    if not args.cache:
+        env['CACHE_BACKEND'] = 'null'
+    log_path = os.path.join(log_dir, 'server.log')
+    with open(log_path, 'wb') as log:
+        # The working directory receives the app's error.log
+        process = subprocess.Popen([sys.executable, '-m', 'benchmarks.load', '--serve', str(port)],
+                                   cwd=log_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = 'http://127.0.0.1:%d' % port
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit('The server exited, see %s' % log_path)
+        try:
+            urlopen(base_url + '/', timeout=1).read()
+            return process, base_url, log_path
+        except (URLError, OSError):
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit('The server did not answer within 30 seconds, see %s' % log_path)
+
+
+def seed_database(args):
+    """Seeds --database-url like benchmarks.run and returns the scale"""
+    os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, ROOT)
+    from settings import create_app, db
+    import models as app_model
+    from benchmarks.seed import seed
+
+    shows = args.shows
+    scale = {
+        'venues': max(1, int(shows * args.venues_per_show)),
+        'artists': max(1, int(shows * args.artists_per_show)),
+        'shows': shows,
+    }
+    print('Seeding %(venues)d venues, %(artists)d artists, %(shows)d shows' % scale, file=sys.stderr)
+    # The migrations that build the schema need the command line app (Flask-Migrate)
+    with create_app().app_context():
+        seed(db, app_model, scale['venues'], scale['artists'], scale['shows'])
+    return scale
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args.serve)
+        return
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.run import git_commit
+
+    mix = parse_mix(args.mix)
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': None if args.url else args.database_url.split(':', 1)[0].split('+', 1)[0],
+        'cache': args.cache,
+        'server': args.url or 'werkzeug, 1 process, threaded',
+        'mix': dict(mix),
+        'duration_s': args.duration,
+        'think_time_s': args.think_time,
+        'scale': None,
+        'stages': [],
+        'results': [],
+    }
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix='fyyur-load-') as log_dir:
+        try:
+            if args.url:
+                base_url = args.url.rstrip('/')
+            else:
+                report['scale'] = seed_database(args)
+                process, base_url, log_path = start_server(args, log_dir)
+
+            if args.warmup:
+                run_stage(base_url, 1, args.warmup, mix, args.seed, timeout=args.timeout)
+            for concurrency in [int(n) for n in args.concurrency.split(',')]:
+                records, seconds = run_stage(base_url, concurrency, args.duration, mix, args.seed,
+                                             think_time=args.think_time, timeout=args.timeout)
+                stage, results = stage_report(concurrency, records, seconds, args.shows if not args.url else 0)
+                report['stages'].append(stage)
+                report['results'].extend(results)
+                print('  %4d users  %8.1f req/s  p50 %8.1f ms  p95 %8.1f ms  p99 %8.1f ms  errors %5.1f%%' % (
+                    concurrency, stage['throughput_rps'], stage['p50_ms'] or 0, stage['p95_ms'] or 0,
+                    stage['p99_ms'] or 0, stage['error_rate'] * 100), file=sys.stderr)
+                for route, summary in stage['routes'].items():
+                    print('        %-28s %7d req  p50 %8.1f ms  p99 %8.1f ms  errors %d' % (
+                        route, summary['requests'], summary['p50_ms'], summary['p99_ms'], summary['errors']),
+                        file=sys.stderr)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+                if any(stage['errors'] for stage in report['stages']):
+                    with open(log_path, 'rb') as log:
+                        # The log is deleted with its directory, so keep the end of it
+                        report['server_log_tail'] = log.read()[-4000:].decode('utf-8', 'replace')
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
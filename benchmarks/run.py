@@ -0,0 +1,185 @@
+"""
+Times the helper_functions hot paths and the routes on seeded databases of increasing size.
+
+    Usage: python -m benchmarks.run [--shows 1000,10000,100000] [--database-url URL] [--output FILE]
+
+    The database at --database-url is DROPPED and re-seeded for every scale. It defaults to a
+    SQLite file; point it at a scratch Postgres database to benchmark Postgres.
+"""
+
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', default='1000,10000,100000',
+                        help='Comma separated numbers of shows, one benchmark run per number')
+    parser.add_argument('--venues-per-show', type=float, default=0.05,
+                        help='Venues created per show (default 1 venue for 20 shows)')
+    parser.add_argument('--artists-per-show', type=float, default=0.1,
+                        help='Artists created per show (default 1 artist for 10 shows)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per benchmark')
+    parser.add_argument('--database-url', default='sqlite:///' + os.path.abspath('benchmark.db'),
+                        help='Scratch database to seed (it is wiped)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Keep the read-through cache on for the route benchmarks')
+    parser.add_argument('--output', default='-', help='Where to write the JSON results (- for stdout)')
+    return parser.parse_args(argv)
+
+
+def time_call(fn, repeat):
+    """
+        Times a callable
+        ----
+        Args
+        ----
+            fn (callable): The code to time
+            repeat (int): Number of timed runs, after one warm-up run
+        -------
+        Returns
+        -------
+            timings (dict): min, median, p95 and mean run time in milliseconds
+    """
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def helper_benchmarks(db, app_model, venue_id, artist_id):
+    """The helper_functions hot paths, by benchmark name"""
+    import helper_functions as controller_funcs
+
+    return {
+        'helpers.get_venues_by_city_and_state': lambda: controller_funcs.get_venues_by_city_and_state(
+            db, app_model, page_size=50),
+        'helpers.get_artist': lambda: controller_funcs.get_artist(db, app_model, page_size=50),
+        'helpers.get_shows': lambda: controller_funcs.get_shows(db, app_model, page_size=50),
+        'helpers.search_venue': lambda: controller_funcs.search_venue(db, app_model, 'blue hall'),
+        'helpers.search_artist': lambda: controller_funcs.search_artist(db, app_model, 'band'),
+        'helpers.venue_detail': lambda: controller_funcs.get_venue_OR_artist_detail(
+            db, app_model, venue_id, for_venue_id=True),
+        'helpers.artist_detail': lambda: controller_funcs.get_venue_OR_artist_detail(
+            db, app_model, artist_id, for_artist_id=True),
+        'helpers.get_genre_members (Jazz venues in San Francisco)': lambda: controller_funcs.get_genre_members(
+            db, app_model, 'Jazz', page_size=50, for_venues=True, state='CA', city='San Francisco'),
+        'helpers.show_venue_OR_artist_details (bulk)': lambda: controller_funcs.show_venue_OR_artist_details(
+            db, app_model, for_venue_id=True),
+    }
+
+
+def route_benchmarks(client, venue_id, artist_id):
+    """The routes, by benchmark name"""
+    # Streamed pages are rendered while their body is read, so every run reads the whole body
+    def get(url):
+        def run():
+            response = client.get(url)
+            response.get_data()
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    def post(url, data):
+        def run():
+            response = client.post(url, data=data)
+            response.get_data()
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    return {
+        'GET /venues': get('/venues'),
+        'GET /artists': get('/artists'),
+        'GET /shows': get('/shows'),
+        'GET /venues/<id>': get('/venues/%d' % venue_id),
+        'GET /artists/<id>': get('/artists/%d' % artist_id),
+        'POST /venues/search': post('/venues/search', {'search_term': 'blue hall'}),
+        'POST /artists/search': post('/artists/search', {'search_term': 'band'}),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # The app reads its configuration on import
+    os.environ['DATABASE_URL'] = args.database_url
+    if not args.cache:
+        os.environ['CACHE_BACKEND'] = 'null'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from app import app
+    from settings import db, cache
+    import models as app_model
+    import search
+    from benchmarks.seed import seed
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': args.database_url.split(':', 1)[0].split('+', 1)[0],
+        'cache': args.cache,
+        'results': [],
+    }
+
+    for shows in [int(n) for n in args.shows.split(',')]:
+        venues = max(1, int(shows * args.venues_per_show))
+        artists = max(1, int(shows * args.artists_per_show))
+        scale = {'venues': venues, 'artists': artists, 'shows': shows}
+        print('Seeding %(venues)d venues, %(artists)d artists, %(shows)d shows' % scale, file=sys.stderr)
+
+        with app.app_context():
+            seed(db, app_model, venues, artists, shows)
+            search.mark_stale()
+            cache.clear()
+            # The busiest venue and artist give the worst case detail pages
+            venue_id = db.session.query(app_model.Show.venue_id).group_by(app_model.Show.venue_id).order_by(
+                db.func.count().desc()).limit(1).scalar() or 1
+            artist_id = db.session.query(app_model.Show.artist_id).group_by(app_model.Show.artist_id).order_by(
+                db.func.count().desc()).limit(1).scalar() or 1
+
+            benchmarks = helper_benchmarks(db, app_model, venue_id, artist_id)
+            benchmarks.update(route_benchmarks(app.test_client(), venue_id, artist_id))
+            for name, fn in benchmarks.items():
+                try:
+                    result = time_call(fn, args.repeat)
+                except Exception as e:
+                    db.session.rollback()
+                    result = {'error': '%s: %s' % (type(e).__name__, e)}
+                report['results'].append({'name': name, **scale, **result})
+                print('  %-45s %s' % (name, result.get('median_ms', result.get('error'))), file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Synthetic data generator for benchmarks and load tests.
+    The data is deterministic for a given random seed, so runs on different commits see the same rows.
+"""
+
+from datetime import date, datetime, time, timedelta
+import os
+import random
+
+from flask_migrate import upgrade
+
+from forms import VenueForm
+from helper_functions import rebuild_genre_links, refresh_show_feed
+from scheduling import Schedule
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('San Diego', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Dallas', 'TX'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Chicago', 'IL'), ('Nashville', 'TN'), ('Memphis', 'TN'), ('Denver', 'CO'),
+    ('Boston', 'MA'), ('Miami', 'FL'), ('Atlanta', 'GA'), ('Detroit', 'MI'), ('Portland', 'ME'),
+    ('Springfield', 'IL'), ('Springfield', 'MA'), ('New Orleans', 'LA'), ('Phoenix', 'AZ'),
+]
+GENRES = [choice for choice, _ in VenueForm.genres.kwargs['choices']]
+VENUE_WORDS = ['Hall', 'Room', 'Club', 'Lounge', 'Theatre', 'Garage', 'Cellar', 'Bar', 'Stage', 'Den']
+ARTIST_WORDS = ['Band', 'Quartet', 'Trio', 'Collective', 'Orchestra', 'Project', 'Ensemble', 'Crew']
+ADJECTIVES = ['Blue', 'Golden', 'Electric', 'Velvet', 'Silent', 'Wild', 'Crimson', 'Midnight',
+              'Lucky', 'Broken', 'Lonely', 'Neon', 'Rusty', 'Hidden', 'Happy', 'Green']
+
+BATCH_SIZE = 5000
+
+
+def _genres(rng):
+    return '{%s}' % ','.join(rng.sample(GENRES, rng.randint(1, 3)))
+
+
+def generate_venues(rng, count):
+    for i in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'id': i,
+            'name': 'The %s %s %d' % (rng.choice(ADJECTIVES), rng.choice(VENUE_WORDS), i),
+            'city': city,
+            'state': state,
+            'address': '%d Main St' % rng.randint(1, 9999),
+            'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+            'genres': _genres(rng),
+            'image_link': 'https://images.example.com/venues/%d.jpg' % i,
+            'facebook_link': 'https://www.facebook.com/venue%d' % i,
+            'website': 'https://venue%d.example.com' % i,
+            'seeking_talent': rng.random() < 0.5,
+            'seeking_description': 'We are looking for %s acts' % rng.choice(GENRES),
+        }
+
+
+def generate_artists(rng, count):
+    for i in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'id': i,
+            'name': '%s %s %d' % (rng.choice(ADJECTIVES), rng.choice(ARTIST_WORDS), i),
+            'city': city,
+            'state': state,
+            'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+            'genres': _genres(rng),
+            'image_link': 'https://images.example.com/artists/%d.jpg' % i,
+            'facebook_link': 'https://www.facebook.com/artist%d' % i,
+            'website': 'https://artist%d.example.com' % i,
+            'seeking_venue': rng.random() < 0.5,
+            'seeking_description': 'Looking for venues in %s' % city,
+        }
+
+
+def generate_shows(rng, count, venues, artists, today=None):
+    """Evening shows spread over two years before and one year after today, without double bookings"""
+    today = datetime.combine(today or date.today(), time())
+    schedule = Schedule()
+    for i in range(1, count + 1):
+        # Draw again until the venue and the artist are both free
+        while True:
+            venue_id, artist_id = rng.randint(1, venues), rng.randint(1, artists)
+            start_time = today + timedelta(days=rng.randint(-730, 365), hours=rng.randint(17, 22))
+            end_time = start_time + timedelta(hours=rng.choice((1, 2, 3)))
+            if schedule.conflict(venue_id, artist_id, start_time, end_time) is None:
+                break
+        schedule.add(i, venue_id, artist_id, start_time, end_time)
+        yield {
+            'id': i,
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time,
+            'end_time': end_time,
+        }
+
+
+def _insert(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(db, app_model, venues, artists, shows, random_seed=0):
+    """
+        Replaces the content of the database with synthetic rows
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            venues, artists, shows (int): The number of rows to create in each table
+            random_seed (int): Seed of the generator
+        Must run inside an app context.
+    """
+    rng = random.Random(random_seed)
+    # Build the schema with the migrations, so the indexes match production
+    db.drop_all()
+    db.session.execute('DROP TABLE IF EXISTS alembic_version')
+    db.session.commit()
+    upgrade(directory=MIGRATIONS_DIR)
+
+    _insert(db, app_model.Venue.__table__, generate_venues(rng, venues))
+    _insert(db, app_model.Artist.__table__, generate_artists(rng, artists))
+    _insert(db, app_model.Show.__table__, generate_shows(rng, shows, venues, artists))
+    refresh_show_feed(db, app_model)
+    rebuild_genre_links(db, app_model, app_model.Venue)
+    rebuild_genre_links(db, app_model, app_model.Artist)
+    db.session.commit()
+
+    if db.engine.dialect.name == 'postgresql':
+        # Explicit ids were inserted, so move the sequences past them
+        for table in ('venues', 'artists', 'shows'):
+            db.session.execute(
+                "SELECT setval(pg_get_serial_sequence('%s', 'id'), (SELECT coalesce(max(id), 1) FROM %s))" % (table, table))
+        db.session.commit()
@@ -0,0 +1,114 @@
+"""
+Measures the cold start of the app: the time a fresh interpreter takes to import it and build it.
+
+    Usage: python -m benchmarks.startup [--target wsgi,app] [--repeat 10] [--top 15] [--output FILE]
+
+    Every run imports a target module (wsgi: the web worker app, app: the app with the command
+    line) in a new Python process. One more run with `python -X importtime` attributes the time to
+    the imported packages and lists the slowest ones. The results have the format of
+    benchmarks.run, so two reports can be compared with benchmarks.compare.
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints the milliseconds spent importing the target, which builds its app
+SNIPPET = ("import time; start = time.perf_counter(); import %s; "
+           "print((time.perf_counter() - start) * 1000)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='wsgi,app', help='Comma separated modules to import')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per target')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest packages listed per target')
+    parser.add_argument('--output', default='-', help='Where to write the JSON results (- for stdout)')
+    return parser.parse_args(argv)
+
+
+def _run(target, importtime=False):
+    # Importing the app does not connect, but the config must not point at a missing driver
+    env = dict(os.environ, DATABASE_URL=os.environ.get('DATABASE_URL', 'sqlite://'),
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'startup-benchmark'))
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', SNIPPET % target]
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def import_profile(stderr, top):
+    """
+        Sums the self time of the imported modules per top-level package
+        ----
+        Args
+        ----
+            stderr (string): The output of python -X importtime
+            top (int): Number of packages to return
+        -------
+        Returns
+        -------
+            packages (list): The slowest packages, with their import time in milliseconds and their module count
+    """
+    self_us, modules = defaultdict(int), defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        self_us[package] += int(self_time)
+        modules[package] += 1
+    slowest = sorted(self_us, key=self_us.get, reverse=True)[:top]
+    return [{'package': package, 'ms': round(self_us[package] / 1000, 3), 'modules': modules[package]}
+            for package in slowest]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, ROOT)
+    from benchmarks.run import git_commit
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'results': [],
+        'profiles': {},
+    }
+    for target in args.target.split(','):
+        samples = sorted(_run(target)[0] for _ in range(args.repeat))
+        result = {
+            'name': 'startup: import %s' % target,
+            'shows': 0,
+            'runs': args.repeat,
+            'min_ms': round(samples[0], 3),
+            'median_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            'mean_ms': round(statistics.fmean(samples), 3),
+        }
+        report['results'].append(result)
+        report['profiles'][target] = import_profile(_run(target, importtime=True)[1], args.top)
+
+        print('  %-30s %10.3f ms' % (result['name'], result['median_ms']), file=sys.stderr)
+        for package in report['profiles'][target]:
+            print('      %-26s %10.3f ms  %4d modules' % (package['package'], package['ms'], package['modules']),
+                  file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
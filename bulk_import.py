@@ -0,0 +1,318 @@
+"""
+This module loads partner catalogues of venues, artists or shows from CSV or JSONL files.
+    Rows are streamed from the file, validated with the same forms as the create pages, and
+    inserted in batches, one transaction per batch (COPY on Postgres, executemany elsewhere).
+    Shows that would double-book a venue or an artist (see scheduling.py) are rejected too.
+    Invalid rows are written to a reject file with their errors. After every committed batch the
+    number of rows consumed is saved to a progress file, so an interrupted import can be resumed.
+
+    Usage: FLASK_APP=app flask import-data venues partner_venues.csv [--resume]
+"""
+
+import csv
+import io
+import json
+import os
+import time
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from helper_functions import genres_literal, parse_genres
+import scheduling
+
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+
+
+def _venue_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'genres': genres_literal(form.genres.data),
+        'image_link': form.image_link.data or None,
+        'facebook_link': form.facebook_link.data or None,
+        'website': form.website_link.data or None,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data or None,
+    }
+
+
+def _artist_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'genres': genres_literal(form.genres.data),
+        'image_link': form.image_link.data or None,
+        'facebook_link': form.facebook_link.data or None,
+        'website': form.website_link.data or None,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data or None,
+    }
+
+
+def _show_row(form):
+    start_time, end_time = scheduling.slot(form.start_time.data, form.end_time.data)
+    return {
+        'venue_id': int(form.venue_id.data),
+        'artist_id': int(form.artist_id.data),
+        'start_time': start_time,
+        'end_time': end_time,
+    }
+
+
+# kind -> (form, model name, form to row converter, boolean fields)
+IMPORTERS = {
+    'venues': (VenueForm, 'Venue', _venue_row, ('seeking_talent',)),
+    'artists': (ArtistForm, 'Artist', _artist_row, ('seeking_venue',)),
+    'shows': (ShowForm, 'Show', _show_row, ()),
+}
+
+
+def read_records(path, file_format):
+    """
+        Streams the records of a CSV or JSONL file
+        ----
+        Args
+        ----
+            path (string): The file to read
+            file_format (string): 'csv' or 'jsonl'
+        -------
+        Yields
+        -------
+            record (dict): One input record per row
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate(kind, record):
+    """
+        Validates an input record with the form of the matching create page
+        ----
+        Args
+        ----
+            kind (string): 'venues', 'artists' or 'shows'
+            record (dict): The input record
+        -------
+        Returns
+        -------
+            (row, errors): The row to insert and None, or None and the form errors
+    """
+    form_class, _, to_row, boolean_fields = IMPORTERS[kind]
+    formdata = MultiDict()
+    for key, value in record.items():
+        if key == 'website':
+            key = 'website_link'
+        if key == 'genres' and isinstance(value, str):
+            value = parse_genres(value)
+        if key in boolean_fields:
+            if str(value).strip().lower() in FALSE_VALUES:
+                continue
+            value = 'y'
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, item)
+        elif value is not None:
+            formdata.add(key, str(value))
+
+    form = form_class(formdata)
+    form.validate()
+    errors = dict(form.errors)
+    if kind == 'shows':
+        for field in (form.venue_id, form.artist_id):
+            if not (field.data or '').isdigit():
+                errors.setdefault(field.name, []).append('Must be a numeric ID.')
+    if errors:
+        return None, errors
+
+    row = to_row(form)
+    if record.get('id') not in (None, ''):
+        row['id'] = int(record['id'])
+    return row, None
+
+
+def _missing_references(db, app_model, rows):
+    """Returns the venue and artist IDs that a batch of shows refers to but do not exist"""
+    missing = {}
+    for column, model in (('venue_id', app_model.Venue), ('artist_id', app_model.Artist)):
+        wanted = {row[column] for row in rows}
+        found = {row[0] for row in db.session.query(model.id).filter(model.id.in_(wanted))}
+        missing[column] = wanted - found
+    return missing
+
+
+def _copy_rows(db, table, rows):
+    """Loads rows with COPY ... FROM STDIN through the session's psycopg2 connection"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (table.name, ', '.join(columns)), buffer)
+
+
+def insert_batch(db, table, rows):
+    """Inserts a batch of rows in the current transaction"""
+    # Rows with and without explicit IDs cannot share one column list
+    for has_id in (True, False):
+        group = [row for row in rows if ('id' in row) == has_id]
+        if not group:
+            continue
+        if db.engine.dialect.name == 'postgresql':
+            _copy_rows(db, table, group)
+        else:
+            db.session.execute(table.insert(), group)
+
+
+def import_file(db, app_model, kind, path, file_format=None, batch_size=1000,
+                rejects_path=None, resume=False, echo=print):
+    """
+        Imports a CSV or JSONL file of venues, artists or shows
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            kind (string): 'venues', 'artists' or 'shows'
+            path (string): The file to import
+            file_format (string): 'csv' or 'jsonl', guessed from the file extension when None
+            batch_size (int): Rows per transaction
+            rejects_path (string): Where invalid rows are written, <path>.rejects.jsonl by default
+            resume (boolean): Skip the rows that a previous run already committed
+            echo (callable): Receives progress messages
+        -------
+        Returns
+        -------
+            stats (dict): Rows read, inserted, rejected and skipped, elapsed seconds and rows per second
+    """
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    rejects_path = rejects_path or path + '.rejects.jsonl'
+    progress_path = path + '.progress'
+    table = getattr(app_model, IMPORTERS[kind][1]).__table__
+
+    skip = 0
+    if resume and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            skip = json.load(f)['rows_done']
+    elif os.path.exists(progress_path):
+        raise click.ClickException('%s exists: pass --resume to continue that import, or delete it' % progress_path)
+    elif os.path.exists(rejects_path):
+        os.remove(rejects_path)
+
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0, 'skipped': skip}
+    # Every show is checked against the booked slots, those in the database and those of the file
+    schedule = scheduling.load_schedule(db, app_model) if kind == 'shows' else None
+    start = time.perf_counter()
+    rows, rejects = [], []
+
+    def commit_batch(rows_done):
+        if kind == 'shows' and rows:
+            missing = _missing_references(db, app_model, [row for _, row in rows])
+            for line, row in list(rows):
+                errors = {column: ['No such ID: %d' % row[column]] for column in missing if row[column] in missing[column]}
+                conflict = None if errors else schedule.conflict(
+                    row['venue_id'], row['artist_id'], row['start_time'], row['end_time'])
+                if conflict is not None:
+                    field, booked = conflict
+                    errors = {field: ['Double booking: overlaps %s' % (
+                        booked if isinstance(booked, str) else 'show #%d' % booked)]}
+                if errors:
+                    rows.remove((line, row))
+                    rejects.append({'line': line, 'record': {k: str(v) for k, v in row.items()}, 'errors': errors})
+                else:
+                    schedule.add('line %d' % line, row['venue_id'], row['artist_id'], row['start_time'], row['end_time'])
+        if rows:
+            insert_batch(db, table, [row for _, row in rows])
+        db.session.commit()
+        if rejects:
+            with open(rejects_path, 'a') as f:
+                for reject in rejects:
+                    f.write(json.dumps(reject) + '\n')
+        with open(progress_path, 'w') as f:
+            json.dump({'rows_done': rows_done}, f)
+
+        stats['inserted'] += len(rows)
+        stats['rejected'] += len(rejects)
+        elapsed = time.perf_counter() - start
+        echo('%d rows, %d inserted, %d rejected, %.0f rows/s' % (
+            rows_done, stats['inserted'], stats['rejected'], (rows_done - skip) / elapsed if elapsed else 0))
+        rows.clear()
+        rejects.clear()
+
+    line = 0
+    for line, record in enumerate(read_records(path, file_format), start=1):
+        if line <= skip:
+            continue
+        stats['read'] += 1
+        row, errors = validate(kind, record)
+        if errors:
+            rejects.append({'line': line, 'record': record, 'errors': errors})
+        else:
+            rows.append((line, row))
+        if len(rows) + len(rejects) >= batch_size:
+            commit_batch(line)
+    commit_batch(max(line, skip))
+
+    if db.engine.dialect.name == 'postgresql':
+        # Rows may have come with explicit IDs, so move the sequence past them
+        db.session.execute("SELECT setval(pg_get_serial_sequence('%s', 'id'), (SELECT coalesce(max(id), 1) FROM %s))"
+                           % (table.name, table.name))
+        db.session.commit()
+    os.remove(progress_path)
+
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    stats['rows_per_second'] = round(stats['read'] / stats['seconds']) if stats['seconds'] else 0
+    return stats
+
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction.')
+@click.option('--rejects', 'rejects_path', help='Reject file, PATH.rejects.jsonl by default.')
+@click.option('--resume', is_flag=True, help='Continue an interrupted import of the same file.')
+@with_appcontext
+def import_data_command(kind, path, file_format, batch_size, rejects_path, resume):
+    """Imports venues, artists or shows from a CSV or JSONL file."""
+    import caching
+    import helper_functions as controller_funcs
+    import models as appmod
+    from settings import db, cache
+
+    stats = import_file(db, appmod, kind, path, file_format=file_format, batch_size=batch_size,
+                        rejects_path=rejects_path, resume=resume, echo=click.echo)
+
+    # COPY does not report the new IDs, so rebuild the derived tables as a whole
+    if kind == 'shows' and stats['inserted']:
+        controller_funcs.refresh_show_feed(db, appmod)
+        db.session.commit()
+    elif stats['inserted']:
+        controller_funcs.rebuild_genre_links(db, appmod, getattr(appmod, IMPORTERS[kind][1]))
+        db.session.commit()
+
+    # Imports touch many pages at once. Bumping the shared 'all' stamp tells every running worker,
+    # on its next request, to drop its cached pages and rebuild its search, autocomplete and
+    # schedule indexes. No restart is needed.
+    caching.everything_changed(cache)
+
+    click.echo('Imported %(inserted)d %(kind)s, rejected %(rejected)d, skipped %(skipped)d already imported '
+               'in %(seconds).1fs (%(rows_per_second)d rows/s)' % dict(stats, kind=kind))
+    if stats['rejected']:
+        click.echo('Rejected rows: %s' % (rejects_path or path + '.rejects.jsonl'))
@@ -0,0 +1,575 @@
+"""
+This module contains the read-through cache placed in front of the helper_functions reads.
+    Every entry is stored with tags naming the rows it was built from, and the write handlers
+    invalidate tags rather than keys, so a write only evicts the entries that show the changed row.
+    Tags in use:
+        venue:<id> / artist:<id>                   every entry showing that venue or artist
+        venue:<id>:detail / artist:<id>:detail     the detail page of that venue or artist
+        venues:list / artists:list / shows:list    listing pages whose boundaries move on inserts and deletes
+    MemoryCache: an in-process LRU with a TTL per entry
+    RedisCache: stores entries in Redis (or anything speaking the same commands, e.g. fakeredis)
+    NullCache: caches nothing
+    Every backend also keeps version stamps, the time of the last change of a collection or entity,
+    which conditional.py turns into ETag and Last-Modified headers. Stamps are never evicted.
+    RedisCache keeps them in Redis, the other backends in the version_stamps table, so every worker
+    and the command line (e.g. import-data) see the same stamps. The in-process structures built
+    from the database (the MemoryCache entries, the search and autocomplete indexes, the show
+    schedule) remember the stamps they were built at, and are rebuilt when these move.
+"""
+
+from collections import OrderedDict
+from datetime import date
+import pickle
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import bindparam, select
+
+import helper_functions as controller_funcs
+
+
+class CacheStats:
+    """Counts cache hits, misses, stores and invalidations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.sets = self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'sets': self.sets,
+            'invalidations': self.invalidations
+        }
+
+
+class DatabaseStamps:
+    """
+        Version stamps kept in the version_stamps table. A stamp that was never bumped is 0.
+        Within a request each stamp is read at most once, and the stamps the request bumps are
+        remembered with their new value.
+    """
+
+    @staticmethod
+    def _read_stamps():
+        # The stamps read by the current request, None outside of a request
+        if not has_request_context():
+            return None
+        if 'version_stamps' not in g:
+            g.version_stamps = {}
+        return g.version_stamps
+
+    def versions(self, names, fresh=False):
+        """Returns the stamps of names, all read from the table with fresh=True"""
+        from models import VersionStamp
+        from settings import db
+
+        stamps = self._read_stamps()
+        if stamps is None:
+            stamps = {}
+        missing = [name for name in names if fresh or name not in stamps]
+        if missing:
+            found = dict(db.session.query(VersionStamp.name, VersionStamp.version).filter(
+                VersionStamp.name.in_(missing)))
+            for name in missing:
+                stamps[name] = found.get(name, 0)
+        return [stamps[name] for name in names]
+
+    def bump_versions(self, *names):
+        from models import VersionStamp
+        from settings import db
+
+        table = VersionStamp.__table__
+        now = int(time.time())
+        # Its own transaction on the primary, so it never waits on the request session
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            connection.execute(insert(table).on_conflict_do_nothing(),
+                               [{'name': name, 'version': 0} for name in names])
+            # The rows stay locked until the commit, so concurrent bumps of a stamp are serialized
+            previous = dict(connection.execute(
+                select(table.c.name, table.c.version).where(table.c.name.in_(names)).with_for_update()).fetchall())
+            bumped = {name: (previous[name], max(now, previous[name] + 1)) for name in names}
+            connection.execute(
+                table.update().where(table.c.name == bindparam('stamp')).values(version=bindparam('new')),
+                [{'stamp': name, 'new': current} for name, (_, current) in bumped.items()])
+
+        stamps = self._read_stamps()
+        if stamps is not None:
+            stamps.update((name, current) for name, (_, current) in bumped.items())
+        return bumped
+
+
+class NullCache:
+    """A backend that never stores anything"""
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self.stamps = DatabaseStamps()
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags=(), ttl=None, snapshot=None):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def versions(self, names):
+        """Returns the version stamp (a Unix time in whole seconds) of each name"""
+        return self.stamps.versions(names)
+
+    def snapshot(self):
+        """Returns what set needs to tell whether data changed while a value loaded, read before the load"""
+        return None
+
+    def bump_versions(self, *names):
+        """
+            Marks the names as changed now. A stamp always moves forward, even within the same second.
+            Returns {name: (stamp before, stamp after)}, so a caller can tell whether another process
+            bumped the stamp since it last read it.
+        """
+        return self.stamps.bump_versions(*names)
+
+    def info(self):
+        return {'backend': 'null', **self.stats.as_dict()}
+
+
+# Every write bumps one of these along with the stamps of its rows (see the write functions below)
+COLLECTION_STAMPS = ['all', 'venues', 'artists', 'shows']
+
+
+def _stamp_names(tags):
+    # The stamps bumped by the writes that invalidate the tags, e.g. venue:3:detail -> venue:3
+    names = {'all'}
+    for tag in tags:
+        parts = tag.split(':')
+        names.add(parts[0] if parts[1] == 'list' else ':'.join(parts[:2]))
+    return sorted(names)
+
+
+class MemoryCache(NullCache):
+    """
+        An in-process LRU cache with a TTL per entry.
+        Entries are kept per worker process, so each worker warms its own copy. Other processes
+        cannot evict them, so every entry is stored with the stamps of its tags (see _stamp_names)
+        and dropped on a get once one of them moved.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags, stamp names, stamps)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+        # Read outside of the lock, the stamps may need a query
+        if self.versions(entry[3]) != entry[4]:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry[1]
+
+    def snapshot(self):
+        return self.versions(COLLECTION_STAMPS)
+
+    def set(self, key, value, tags=(), ttl=None, snapshot=None):
+        names = _stamp_names(tags)
+        # One read, so the stamps of the entry are those of the same moment as the collection stamps
+        stamps = self.stamps.versions(COLLECTION_STAMPS + names, fresh=True)
+        if snapshot is not None and stamps[:len(COLLECTION_STAMPS)] != snapshot:
+            # Data was written while the value loaded, the value may miss it
+            return
+        stamps = stamps[len(COLLECTION_STAMPS):]
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tuple(tags), names, stamps)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        tags = self._entries.pop(key)[2]
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def info(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'max_entries': self.max_entries,
+                'evictions': self.evictions, **self.stats.as_dict()}
+
+
+class RedisCache(NullCache):
+    """
+        Stores pickled entries in Redis and keeps one Redis set of keys per tag.
+        Only GET, MGET, SET (EX), INCRBY, DEL, SADD, SMEMBERS, EXPIRE, SCAN and pipelines are used, so a
+        local fake such as fakeredis.FakeRedis can stand in for the client.
+    """
+
+    def __init__(self, client, default_ttl=300, prefix='fyyur:'):
+        super().__init__()
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.version_prefix = prefix.rstrip(':') + '-version:'
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, tags=(), ttl=None, snapshot=None):
+        ttl = ttl or self.default_ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            self.client.sadd(tag_key, key)
+            # A tag set only needs to outlive the entries it points to
+            self.client.expire(tag_key, ttl)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = [self.prefix + (key.decode() if isinstance(key, bytes) else key)
+                    for key in self.client.smembers(tag_key)]
+            self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        # Version stamps live under another prefix, so clearing never turns them back
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def versions(self, names):
+        # A stamp that was never bumped is 0, so reading never creates a key
+        values = self.client.mget([self.version_prefix + name for name in names])
+        return [int(value or 0) for value in values]
+
+    def bump_versions(self, *names):
+        now = int(time.time())
+        # INCRBY is atomic, so concurrent bumps all move the stamp and each gets its own value.
+        # The step brings the stamp up to now, and is at least 1 if it already is.
+        steps = [max(1, now - stamp) for stamp in self.versions(names)]
+        pipeline = self.client.pipeline()
+        for name, step in zip(names, steps):
+            pipeline.incrby(self.version_prefix + name, step)
+        return {name: (current - step, current) for name, step, current in zip(names, steps, pipeline.execute())}
+
+    def info(self):
+        return {'backend': 'redis', **self.stats.as_dict()}
+
+
+def create_cache(config):
+    """
+        Builds the cache backend selected by the app configuration
+        ----
+        Args
+        ----
+            config (Config): The Flask app config (CACHE_BACKEND, CACHE_DEFAULT_TTL, CACHE_MAX_ENTRIES, CACHE_REDIS_URL)
+        -------
+        Returns
+        -------
+            cache (NullCache): The cache backend
+    """
+    backend = config.get('CACHE_BACKEND', 'memory')
+    ttl = config.get('CACHE_DEFAULT_TTL', 300)
+    if backend == 'memory':
+        return MemoryCache(max_entries=config.get('CACHE_MAX_ENTRIES', 1024), default_ttl=ttl)
+    if backend == 'redis':
+        import redis  # Optional dependency, only needed for this backend
+        return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), default_ttl=ttl)
+    if backend == 'null':
+        return NullCache()
+    raise ValueError('Unknown CACHE_BACKEND: %s' % backend)
+
+
+class Cache:
+    """
+        The cache of the app, importable before the app is created (views and decorators hold it).
+        init_app selects the backend from the app configuration, and every other attribute is the
+        backend's. Until then it caches nothing.
+    """
+
+    def __init__(self):
+        self.backend = NullCache()
+
+    def init_app(self, app):
+        self.backend = create_cache(app.config)
+        app.extensions['cache'] = self
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def read_through(cache, key, loader, tags):
+    """
+        Returns the cached value of key, or loads, stores and returns it on a miss
+        ----
+        Args
+        ----
+            cache (NullCache): The cache backend
+            key (string): The cache key
+            loader (callable): Computes the value on a miss. A None value is not cached
+            tags (callable): Returns the tags of a loaded value
+        -------
+        Returns
+        -------
+            value: The cached or freshly loaded value
+    """
+    value = cache.get(key)
+    if value is not None:
+        cache.stats.incr('hits')
+        return value
+    cache.stats.incr('misses')
+    snapshot = cache.snapshot()
+    value = loader()
+    if value is not None:
+        cache.set(key, value, tags=tags(value), snapshot=snapshot)
+        cache.stats.incr('sets')
+    return value
+
+
+#  Cached reads
+#  ----------------------------------------------------------------
+
+def _page_key(prefix, page_size, after, before):
+    return '%s:%d:%s:%s' % (prefix, page_size, after or '', before or '')
+
+
+def _venue_page_tags(page):
+    return ['venues:list'] + ['venue:%d' % venue['id'] for area in page.items for venue in area['venues']]
+
+
+def get_venues_by_city_and_state(cache, db, app_model, page_size, after=None, before=None, venues_limit=10):
+    """Cached helper_functions.get_venues_by_city_and_state"""
+    return read_through(
+        cache, _page_key('venues:page', page_size, after, before) + ':%d' % venues_limit,
+        lambda: controller_funcs.get_venues_by_city_and_state(
+            db, app_model, page_size, after=after, before=before, venues_limit=venues_limit),
+        _venue_page_tags)
+
+
+def get_area_venues(cache, db, app_model, state, city, page_size, after=None, before=None):
+    """Cached helper_functions.get_area_venues"""
+    return read_through(
+        cache, _page_key('venues:area:%s:%s' % (state, city), page_size, after, before),
+        lambda: controller_funcs.get_area_venues(db, app_model, state, city, page_size, after=after, before=before),
+        _venue_page_tags)
+
+
+def get_artist(cache, db, app_model, page_size, after=None, before=None):
+    """Cached helper_functions.get_artist"""
+    return read_through(
+        cache, _page_key('artists:page', page_size, after, before),
+        lambda: controller_funcs.get_artist(db, app_model, page_size, after=after, before=before),
+        lambda page: ['artists:list'] + ['artist:%d' % artist['id'] for artist in page.items])
+
+
+def get_shows(cache, db, app_model, page_size, after=None, before=None, venue_id=None, artist_id=None, upcoming=None):
+    """Cached helper_functions.get_shows"""
+    def tags(page):
+        tags = {'shows:list'}
+        for show in page.items:
+            tags.add('venue:%d' % show['venue_id'])
+            tags.add('artist:%d' % show['artist_id'])
+        return list(tags)
+
+    key = _page_key('shows:page', page_size, after, before)
+    if venue_id is not None or artist_id is not None or upcoming is not None:
+        # The past/upcoming split depends on the date, so it is part of the key
+        key += ':%s:%s:%s:%s' % (venue_id, artist_id, upcoming, date.today().isoformat())
+    return read_through(
+        cache, key,
+        lambda: controller_funcs.get_shows(db, app_model, page_size, after=after, before=before,
+                                           venue_id=venue_id, artist_id=artist_id, upcoming=upcoming),
+        tags)
+
+
+def _calendar_key(prefix, start, end, venue_id, artist_id, city, state):
+    return '%s:%s:%s:%s:%s:%s:%s' % (prefix, start.isoformat(), end.isoformat(), venue_id, artist_id, city, state)
+
+
+def get_calendar(cache, db, app_model, start, end, page_size, after=None, before=None, venue_id=None,
+                 artist_id=None, city=None, state=None):
+    """Cached helper_functions.get_calendar"""
+    def tags(page):
+        tags = {'shows:list'}
+        for show in page.items:
+            tags.add('venue:%d' % show['venue_id'])
+            tags.add('artist:%d' % show['artist_id'])
+        return list(tags)
+
+    key = _calendar_key('calendar:page', start, end, venue_id, artist_id, city, state)
+    return read_through(
+        cache, key + ':' + _page_key('', page_size, after, before),
+        lambda: controller_funcs.get_calendar(db, app_model, start, end, page_size, after=after, before=before,
+                                              venue_id=venue_id, artist_id=artist_id, city=city, state=state),
+        tags)
+
+
+def get_calendar_day_counts(cache, db, app_model, start, end, venue_id=None, artist_id=None, city=None, state=None):
+    """Cached helper_functions.get_calendar_day_counts, shared by every page of the same range"""
+    # A new show, a venue moving to another city and a deleted venue or artist all change the counts
+    return read_through(
+        cache, _calendar_key('calendar:days', start, end, venue_id, artist_id, city, state),
+        lambda: controller_funcs.get_calendar_day_counts(db, app_model, start, end, venue_id=venue_id,
+                                                         artist_id=artist_id, city=city, state=state),
+        lambda counts: ['shows:list', 'venues:list', 'artists:list'])
+
+
+def get_venue_OR_artist_detail(cache, db, app_model, entity_id, for_venue_id=False, for_artist_id=False, shows_limit=12):
+    """Cached helper_functions.get_venue_OR_artist_detail"""
+    kind, other, other_id = ('venue', 'artist', 'artist_id') if for_venue_id else ('artist', 'venue', 'venue_id')
+
+    def tags(details):
+        shows = details['past_shows'] + details['upcoming_shows']
+        return ['%s:%d:detail' % (kind, entity_id)] + list({'%s:%d' % (other, show[other_id]) for show in shows})
+
+    # The past/upcoming split depends on the date, so it is part of the key
+    return read_through(
+        cache, '%s:%d:detail:%s' % (kind, entity_id, date.today().isoformat()),
+        lambda: controller_funcs.get_venue_OR_artist_detail(
+            db, app_model, entity_id, for_venue_id=for_venue_id, for_artist_id=for_artist_id,
+            shows_limit=shows_limit),
+        tags)
+
+
+#  Invalidation
+#  ----------------------------------------------------------------
+
+def invalidate(cache, *tags):
+    """Evicts every entry carrying one of the tags"""
+    cache.invalidate(*tags)
+    cache.stats.incr('invalidations', len(tags))
+
+
+# Version stamps read by conditional.py:
+#     venues / artists / shows     the listing pages
+#     venue:<id> / artist:<id>     the detail page of that venue or artist
+#     all                          every page, bumped when data changed in bulk
+# The functions below return what bump_versions returned, for after_bump.
+
+def after_bump(version, names, bumped):
+    """
+        Carries the stamps of an in-process structure over a write of this process
+        ----
+        Args
+        ----
+            version (list): The stamps of names the structure was up to date with
+            names (list): The stamp names
+            bumped (dict): What the write's bump_versions returned
+        -------
+        Returns
+        -------
+            version (list): The stamps of names once the structure has the write, or None when another
+                process bumped one of them since, so the structure misses its change and must be rebuilt
+    """
+    carried = []
+    for name, stamp in zip(names, version):
+        if name in bumped:
+            previous, current = bumped[name]
+            if stamp != previous:
+                return None
+            stamp = current
+        carried.append(stamp)
+    return carried
+
+
+def venue_created(cache):
+    invalidate(cache, 'venues:list')
+    return cache.bump_versions('venues')
+
+
+def venue_changed(cache, venue_id, area_changed=False):
+    """A venue was edited. Moving it to another city or state changes the listing boundaries."""
+    tags = ['venue:%s' % venue_id, 'venue:%s:detail' % venue_id]
+    if area_changed:
+        tags.append('venues:list')
+    invalidate(cache, *tags)
+    # Artist pages list the venue name too, and depend on the 'venues' stamp
+    return cache.bump_versions('venues', 'venue:%s' % venue_id, 'shows')
+
+
+def venue_deleted(cache, venue_id):
+    invalidate(cache, 'venue:%s' % venue_id, 'venue:%s:detail' % venue_id, 'venues:list')
+    return cache.bump_versions('venues', 'venue:%s' % venue_id, 'shows')
+
+
+def artist_created(cache):
+    invalidate(cache, 'artists:list')
+    return cache.bump_versions('artists')
+
+
+def artist_changed(cache, artist_id, name_changed=False):
+    """An artist was edited. The artist listing is ordered by name, so a rename moves its boundaries."""
+    tags = ['artist:%s' % artist_id, 'artist:%s:detail' % artist_id]
+    if name_changed:
+        tags.append('artists:list')
+    invalidate(cache, *tags)
+    # Venue pages list the artist name and image too, and depend on the 'artists' stamp
+    return cache.bump_versions('artists', 'artist:%s' % artist_id, 'shows')
+
+
+def artist_deleted(cache, artist_id):
+    invalidate(cache, 'artist:%s' % artist_id, 'artist:%s:detail' % artist_id, 'artists:list')
+    return cache.bump_versions('artists', 'artist:%s' % artist_id, 'shows')
+
+
+def show_created(cache, venue_id, artist_id):
+    invalidate(cache, 'shows:list', 'venue:%s:detail' % venue_id, 'artist:%s:detail' % artist_id)
+    return cache.bump_versions('shows', 'venue:%s' % venue_id, 'artist:%s' % artist_id)
+
+
+def everything_changed(cache):
+    """
+        Rows were changed in bulk (e.g. by an import), so nothing cached can be trusted. The 'all'
+        stamp is shared, so the other processes drop their in-process caches and indexes too.
+    """
+    cache.clear()
+    return cache.bump_versions('all')
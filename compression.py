@@ -0,0 +1,154 @@
+"""
+This module compresses the responses of the app with gzip, or brotli when the brotli package is
+installed, as negotiated from the Accept-Encoding request header.
+    Buffered bodies shorter than COMPRESSION_MIN_SIZE are sent as is. Streamed bodies (the listing
+    pages, see stream_template in app.py) are compressed chunk by chunk, flushing after every
+    chunk, so the browser still gets the first rows before the page is rendered.
+    A compressed response is another representation of the page, so its ETag gets the suffix of
+    the encoding ("<tag>-gzip") and every compressible response varies on Accept-Encoding.
+    conditional.py only matches If-None-Match with the ETags of the representations this request
+    may get: the page as is, or in the encoding negotiated from its Accept-Encoding.
+"""
+
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli  # Optional dependency
+except ImportError:
+    brotli = None
+
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+class GzipStream:
+    """Compresses a body chunk by chunk into one gzip member"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    """Compresses a body chunk by chunk into one brotli stream"""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def negotiated_encoding(config):
+    """The encoding compress_response picks for the current request, None when compression is off"""
+    if not config['COMPRESSION_ENABLED']:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def matching_etag(if_none_match, tag, encoding):
+    """
+        Finds the ETag, as the client sent it, of a representation of the page tagged `tag` that the
+        current request may get
+        ----
+        Args
+        ----
+            if_none_match (ETags): The parsed If-None-Match header
+            tag (string): The ETag of the uncompressed page
+            encoding (string): The negotiated encoding (see negotiated_encoding), None for none
+        -------
+        Returns
+        -------
+            etag (string): The matching ETag of the If-None-Match header, None if there is none
+    """
+    # A body shorter than COMPRESSION_MIN_SIZE is sent as is even when an encoding is negotiated
+    accepted = {tag} if encoding is None else {tag, '%s-%s' % (tag, encoding)}
+    for sent in if_none_match.as_set(include_weak=True):
+        if sent in accepted:
+            return sent
+    return None
+
+
+def _compressible(config, response):
+    return response.mimetype in config['COMPRESSION_MIMETYPES']
+
+
+def _stream(chunks, compressor, original):
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(original, 'close'):
+            original.close()
+
+
+def compress_response(config, response):
+    """
+        Compresses a response in the best encoding the client accepts, when it is worth it
+        ----
+        Args
+        ----
+            config (dict): The app config, with the COMPRESSION_* settings
+            response (Response): The response of the view
+        -------
+        Returns
+        -------
+            response (Response): The same response, compressed or not
+    """
+    if not config['COMPRESSION_ENABLED'] or not _compressible(config, response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code < 200 or response.status_code in (204, 206, 304) or
+            response.direct_passthrough or 'Content-Encoding' in response.headers or
+            'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    encoding = negotiated_encoding(config)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        compressor = (BrotliStream(config['COMPRESSION_BROTLI_QUALITY']) if encoding == 'br'
+                      else GzipStream(config['COMPRESSION_LEVEL']))
+        original = response.response
+        response.response = _stream(response.iter_encoded(), compressor, original)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=config['COMPRESSION_BROTLI_QUALITY']))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=config['COMPRESSION_LEVEL'], mtime=0))
+
+    response.headers['Content-Encoding'] = encoding
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag('%s-%s' % (tag, encoding), weak)
+    return response
+
+
+def init_compression(app):
+    """
+        Compresses every response of the app (see compress_response)
+        ----
+        Args
+        ----
+            app (Flask): The Flask app
+    """
+    app.after_request(lambda response: compress_response(app.config, response))
@@ -0,0 +1,74 @@
+"""
+This module answers conditional GET requests on the read pages without running their queries.
+    A page declares the version stamps it depends on (see caching.py). Its ETag is a hash of the
+    URL, those stamps and the current date (the past/upcoming split of shows moves every day), and
+    its Last-Modified is the newest of them. When the client's If-None-Match or If-Modified-Since
+    still matches, a 304 is sent before the view runs. The ETag of a compressed page has the suffix
+    of its encoding (see compression.py). Only the ETags of the page as is and in the encoding the
+    request negotiates match, and the 304 repeats the ETag the client sent.
+    Responses carry Cache-Control: public, so a reverse proxy may store them. With
+    HTTP_CACHE_MAX_AGE = 0 the proxy revalidates every request, which costs one 304 from us.
+"""
+
+from datetime import date, datetime, time as dt_time, timezone
+from functools import wraps
+import hashlib
+import time
+
+from flask import Response, current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+from compression import matching_etag, negotiated_encoding
+
+
+def _validators(cache, names):
+    versions = cache.versions(['all'] + names)
+    today = date.today()
+    tag = hashlib.sha1(repr((request.full_path, versions, today.isoformat())).encode()).hexdigest()
+    midnight = datetime.combine(today, dt_time()).timestamp()
+    # Many bumps within a second move the stamps ahead of the clock, and a date in the future
+    # would keep matching If-Modified-Since after the next change
+    last_modified = datetime.fromtimestamp(min(max(max(versions), midnight), time.time()), timezone.utc)
+    return tag, last_modified
+
+
+def _set_headers(response, tag, last_modified):
+    response.set_etag(tag)
+    response.last_modified = last_modified
+    max_age = current_app.config['HTTP_CACHE_MAX_AGE']
+    response.headers['Cache-Control'] = 'public, max-age=%d' % max_age if max_age else 'public, no-cache'
+    return response
+
+
+def conditional(cache, stamps):
+    """
+        Decorates a view so that its GET responses carry an ETag and a Last-Modified header,
+        and matching conditional requests are answered with 304 Not Modified
+        ----
+        Args
+        ----
+            cache (NullCache): The cache backend holding the version stamps
+            stamps (callable): Receives the view arguments and returns the names of the stamps the page depends on
+        -------
+        Returns
+        -------
+            decorator (callable): The view decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(**kwargs):
+            # Pages showing flashed messages are personal, so they are neither validated nor shared
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(**kwargs)
+
+            tag, last_modified = _validators(cache, stamps(**kwargs))
+            sent = matching_etag(request.if_none_match, tag, negotiated_encoding(current_app.config)) or tag
+            if not is_resource_modified(request.environ, etag=sent, last_modified=last_modified):
+                return _set_headers(Response(status=304), sent, last_modified)
+
+            response = make_response(view(**kwargs))
+            if response.status_code == 200:
+                _set_headers(response, tag, last_modified)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,221 @@
+"""
+This module configures the database engines of each worker process.
+    - The connection pool is sized from the app config (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+      DB_POOL_RECYCLE, DB_POOL_PRE_PING). New Postgres connections run SET statement_timeout, with
+      DB_STATEMENT_TIMEOUT_MS on the primary and DB_READ_STATEMENT_TIMEOUT_MS on the read bind.
+    - Every pool counts its checkouts, the time spent waiting for a connection and the timeouts.
+      pool_info() reports them with the pool occupancy.
+    - When DATABASE_READ_URL is set, read-only queries go to that endpoint (a replica, or a pgbouncer
+      in front of one). Writes, and any query in a transaction that has already written, stay on
+      the primary. A replica may lag behind, so a page read right after a write may not show it yet.
+"""
+
+import threading
+import time
+
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, _EngineConnector
+from sqlalchemy import event, exc, orm
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select
+
+
+class PoolStats:
+    """Counts connection checkouts, the time spent waiting for them, and pool timeouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = self.timeouts = 0
+        self.wait_ms_total = self.wait_ms_max = 0.0
+
+    def record(self, wait_ms, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def as_dict(self):
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_ms_avg': round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+            'wait_ms_max': round(self.wait_ms_max, 3),
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool that times how long each checkout waits, including opening a new connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        self.stats.record((time.perf_counter() - start) * 1000)
+        return connection
+
+    def recreate(self):
+        # Disposing the engine (e.g. after a database restart) replaces the pool, not the history
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def info(self):
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': max(0, self.overflow()),
+            'max_overflow': self._max_overflow,
+            **self.stats.as_dict()
+        }
+
+
+class RoutingSession(SignallingSession):
+    """Sends read-only queries to the 'read' bind when there is one"""
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if ('read' in (self.app.config['SQLALCHEMY_BINDS'] or {}) and isinstance(clause, Select)
+                and not self._flushing and not self.info.get('wrote')
+                and not (self.new or self.dirty or self.deleted)):
+            return self.db.get_engine(self.app, bind='read')
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _clear_written(session):
+    session.info.pop('wrote', None)
+
+
+def statement_timeout_listener(timeout_ms):
+    """
+        Builds a pool 'connect' listener setting the statement_timeout of new Postgres connections.
+        A SET rather than the 'options' startup parameter, which pgbouncer refuses.
+        ----
+        Args
+        ----
+            timeout_ms (int): The statement_timeout in milliseconds
+        -------
+        Returns
+        -------
+            listener (callable): The listener
+    """
+    def set_statement_timeout(dbapi_connection, connection_record):
+        # Outside of a transaction, or the rollback at checkin would undo the SET
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET statement_timeout = %d' % timeout_ms)
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
+    return set_statement_timeout
+
+
+class TimeoutEngineConnector(_EngineConnector):
+    """Creates the engine of a bind, with the statement_timeout of that bind on Postgres"""
+
+    def get_engine(self):
+        engine = super().get_engine()
+        timeout_ms = self._app.config['DB_READ_STATEMENT_TIMEOUT_MS' if self._bind == 'read' else
+                                      'DB_STATEMENT_TIMEOUT_MS']
+        # The engine is created again when the URL changes, so the listener follows the engine
+        if engine is not getattr(self, '_timed_engine', None):
+            if engine.dialect.name == 'postgresql' and timeout_ms:
+                event.listen(engine, 'connect', statement_timeout_listener(timeout_ms))
+            self._timed_engine = engine
+        return engine
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with sessions that route reads through RoutingSession"""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def make_connector(self, app=None, bind=None):
+        return TimeoutEngineConnector(self, self.get_app(app), bind)
+
+
+def engine_options(config):
+    """
+        Builds the create_engine options of the app engines
+        ----
+        Args
+        ----
+            config (Config): The Flask app config
+        -------
+        Returns
+        -------
+            options (dict): The SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # One shared connection holds the whole database, there is nothing to pool
+        return {}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if url.get_backend_name() == 'sqlite':
+        # Pooled connections move between the request threads
+        options['connect_args'] = {'check_same_thread': False}
+    # The statement_timeout differs per bind, see TimeoutEngineConnector
+    return options
+
+
+def configure_database(app):
+    """
+        Sets the engine options and the read bind of the app. Must run before the engines are created.
+        ----
+        Args
+        ----
+            app (Flask): The Flask app
+    """
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    if app.config['DATABASE_READ_URL']:
+        app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {},
+                                              read=app.config['DATABASE_READ_URL'])
+
+
+def pool_info(db, app):
+    """
+        Reports the occupancy and the checkout statistics of the app connection pools
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app (Flask): The Flask app
+        -------
+        Returns
+        -------
+            info (dict): Pool information of the 'primary' engine, and of the 'read' engine if there is one
+    """
+    engines = {'primary': db.get_engine(app)}
+    if 'read' in (app.config['SQLALCHEMY_BINDS'] or {}):
+        engines['read'] = db.get_engine(app, bind='read')
+    return {
+        name: engine.pool.info() if isinstance(engine.pool, TimedQueuePool) else {'pool': type(engine.pool).__name__}
+        for name, engine in engines.items()
+    }
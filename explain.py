@@ -0,0 +1,160 @@
+"""
+This module checks that the hot queries of the Fyyur application use their indexes.
+    It runs each helper behind a page, captures the SQL statements it sends to the database
+    and prints the EXPLAIN plan of every statement.
+
+    Usage: FLASK_APP=app flask explain-hot-queries [--no-seqscan]
+"""
+
+from contextlib import contextmanager
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+import helper_functions as controller_funcs
+
+
+@contextmanager
+def capture_statements(engine):
+    """
+        Records the SQL statements executed on an engine while the context is active
+        ----
+        Args
+        ----
+            engine (Engine): The SQLAlchemy engine to listen on
+        -------
+        Yields
+        -------
+            statements (list): A list that receives (statement, parameters) tuples
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(connection, statement, parameters):
+    """
+        Returns the query plan of a statement as a list of lines
+        ----
+        Args
+        ----
+            connection (Connection): An open connection
+            statement (string): The SQL statement, in the driver's parameter style
+            parameters (tuple or dict): The statement parameters
+        -------
+        Returns
+        -------
+            plan (list): The lines of the plan
+    """
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+    return [row[0] for row in rows]
+
+
+def is_sequential_scan(plan_line, table):
+    """Tells whether a plan line is a full scan of the given table"""
+    return (plan_line.strip().startswith('Seq Scan on ' + table) or  # postgres
+            plan_line.strip() in ('SCAN ' + table, 'SCAN TABLE ' + table))  # sqlite
+
+
+def hot_queries(db, app_model):
+    """
+        Lists the helpers behind the busiest pages, with sample arguments taken from the db
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+        -------
+        Returns
+        -------
+            queries (dict): Maps a query name to a callable running it
+    """
+    venue_id = db.session.query(app_model.Venue.id).limit(1).scalar() or 1
+    artist_id = db.session.query(app_model.Artist.id).limit(1).scalar() or 1
+
+    return {
+        'venue detail': lambda: controller_funcs.get_venue_OR_artist_detail(
+            db=db, app_model=app_model, entity_id=venue_id, for_venue_id=True),
+        'artist detail': lambda: controller_funcs.get_venue_OR_artist_detail(
+            db=db, app_model=app_model, entity_id=artist_id, for_artist_id=True),
+        'venue listing': lambda: controller_funcs.get_venues_by_city_and_state(
+            db=db, app_model=app_model, page_size=50),
+        'artist listing': lambda: controller_funcs.get_artist(
+            db=db, app_model=app_model, page_size=50),
+        'show listing': lambda: controller_funcs.get_shows(
+            db=db, app_model=app_model, page_size=50),
+        'calendar month': lambda: controller_funcs.get_calendar(
+            db, app_model, *controller_funcs.calendar_range('month', date.today()), page_size=50),
+        'calendar day counts': lambda: controller_funcs.get_calendar_day_counts(
+            db, app_model, *controller_funcs.calendar_range('month', date.today())),
+        'venue calendar': lambda: controller_funcs.get_calendar(
+            db, app_model, *controller_funcs.calendar_range('month', date.today()), page_size=50,
+            venue_id=venue_id),
+        'venue search': lambda: controller_funcs.search_venue(
+            db=db, app_model=app_model, search_term='music'),
+        'artist search': lambda: controller_funcs.search_artist(
+            db=db, app_model=app_model, search_term='band'),
+    }
+
+
+def explain_hot_queries(db, app_model, no_seqscan=False):
+    """
+        Runs every hot query and collects the plans of the statements it issued
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            no_seqscan (boolean): Postgres only, plan with sequential scans discouraged
+        -------
+        Returns
+        -------
+            plans (list): (query name, statement, plan lines) tuples
+    """
+    plans = []
+    engine = db.engine
+    for name, run in hot_queries(db, app_model).items():
+        with capture_statements(engine) as statements:
+            run()
+        # SET LOCAL ends with the transaction, so the pooled connection goes back unchanged
+        with engine.begin() as connection:
+            if no_seqscan and connection.dialect.name == 'postgresql':
+                connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for statement, parameters in statements:
+                plans.append((name, statement, explain(connection, statement, parameters)))
+    return plans
+
+
+@click.command('explain-hot-queries')
+@click.option('--no-seqscan', is_flag=True,
+              help='Postgres only: discourage sequential scans, so small dev databases show the index the planner would use on a large table.')
+@with_appcontext
+def explain_hot_queries_command(no_seqscan):
+    """Prints the EXPLAIN plan of every hot query and flags full scans of the shows table."""
+    import models as appmod
+    from settings import db
+
+    seq_scans = 0
+    for name, statement, plan in explain_hot_queries(db, appmod, no_seqscan=no_seqscan):
+        click.echo('== ' + name)
+        click.echo(' '.join(statement.split()))
+        for line in plan:
+            flagged = is_sequential_scan(line, 'shows')
+            seq_scans += flagged
+            click.echo(('!! ' if flagged else '   ') + line)
+        click.echo('')
+
+    if seq_scans:
+        raise click.ClickException('%d sequential scan(s) of the shows table' % seq_scans)
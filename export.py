@@ -0,0 +1,157 @@
+"""
+This module dumps the venues, artists or shows as CSV or NDJSON, for the /export pages and the
+export-data command.
+    Rows are read in id order through a server-side cursor (yield_per, which sets stream_results),
+    EXPORT_BATCH_SIZE at a time, and every batch is encoded and sent before the next one is
+    fetched, so memory use does not grow with the table. The output can be read back with
+    import-data: the columns are those the import accepts, with times in the ShowForm format.
+
+    Usage: FLASK_APP=app flask export-data shows shows.csv.gz
+"""
+
+import csv
+import io
+import json
+import sys
+import zlib
+
+import click
+from flask.cli import with_appcontext
+
+from compression import GzipStream
+from helper_functions import parse_genres
+
+
+# kind -> (model name, exported columns)
+EXPORTERS = {
+    'venues': ('Venue', ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                         'facebook_link', 'website', 'seeking_talent', 'seeking_description')),
+    'artists': ('Artist', ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link',
+                           'website', 'seeking_venue', 'seeking_description')),
+    'shows': ('Show', ('id', 'venue_id', 'artist_id', 'start_time', 'end_time')),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def stream_rows(db, app_model, kind, batch_size=1000):
+    """
+        Streams the rows of a table in id order, fetching batch_size rows at a time
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            kind (string): 'venues', 'artists' or 'shows'
+            batch_size (int): Rows fetched from the cursor at a time
+        -------
+        Yields
+        -------
+            row (Row): The exported columns of one row
+    """
+    model_name, columns = EXPORTERS[kind]
+    model = getattr(app_model, model_name)
+    # Plain column rows, not entities, so nothing accumulates in the session's identity map
+    query = db.session.query(*[getattr(model, column) for column in columns]).order_by(model.id)
+    yield from query.yield_per(batch_size)
+
+
+def _record(row):
+    record = row._asdict()
+    for key in ('start_time', 'end_time'):
+        if record.get(key) is not None:
+            record[key] = record[key].strftime(TIME_FORMAT)
+    return record
+
+
+def _csv_batch(records, columns, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns)
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+def _ndjson_batch(records):
+    lines = []
+    for record in records:
+        if 'genres' in record:
+            record['genres'] = parse_genres(record['genres'])
+        lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+    return ''.join(lines)
+
+
+def export_chunks(db, app_model, kind, file_format, batch_size=1000, compress=False):
+    """
+        Encodes a table as CSV (with a header line) or NDJSON, one chunk per batch of rows
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            kind (string): 'venues', 'artists' or 'shows'
+            file_format (string): 'csv' or 'ndjson'
+            batch_size (int): Rows per chunk
+            compress (boolean): Gzip the output
+        -------
+        Yields
+        -------
+            chunk (bytes): The encoded output, in order
+    """
+    columns = EXPORTERS[kind][1]
+    gzip_stream = GzipStream(zlib.Z_DEFAULT_COMPRESSION) if compress else None
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return gzip_stream.compress(data) if gzip_stream else data
+
+    if file_format == 'csv':
+        yield encode(_csv_batch([], columns, header=True))
+
+    batch = []
+    for row in stream_rows(db, app_model, kind, batch_size):
+        batch.append(_record(row))
+        if len(batch) >= batch_size:
+            yield encode(_csv_batch(batch, columns) if file_format == 'csv' else _ndjson_batch(batch))
+            batch = []
+    if batch:
+        yield encode(_csv_batch(batch, columns) if file_format == 'csv' else _ndjson_batch(batch))
+    if gzip_stream:
+        yield gzip_stream.finish()
+
+
+@click.command('export-data')
+@click.argument('kind', type=click.Choice(sorted(EXPORTERS)))
+@click.argument('path', default='-')
+@click.option('--format', 'file_format', type=click.Choice(sorted(FORMATS)),
+              help='Output format, guessed from the file extension by default.')
+@click.option('--gzip', 'compress', is_flag=True, default=None,
+              help='Gzip the output, the default when PATH ends with .gz.')
+@click.option('--batch-size', type=int, help='Rows fetched at a time, EXPORT_BATCH_SIZE by default.')
+@with_appcontext
+def export_data_command(kind, path, file_format, compress, batch_size):
+    """Exports venues, artists or shows to a CSV or NDJSON file, or to standard output with PATH -."""
+    from flask import current_app
+
+    import models as appmod
+    from settings import db
+
+    name = path[:-3] if path.endswith('.gz') else path
+    file_format = file_format or ('ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    if compress is None:
+        compress = path.endswith('.gz')
+    batch_size = batch_size or current_app.config['EXPORT_BATCH_SIZE']
+
+    out = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    try:
+        for chunk in export_chunks(db, appmod, kind, file_format, batch_size=batch_size, compress=compress):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
@@ -13,6 +13,14 @@ def test():
         abort("Aborted at user request.")
 
 
+def benchmark():
+    local("python -m benchmarks.run --output bench_output.json")
+
+
+def build_assets():
+    local("FLASK_APP=app flask build-assets")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,79 @@
+"""
+This module formats dates for the templates (the 'datetime' filter).
+    Values are expected as date or datetime objects, as the helper_functions return them. Strings
+    are still accepted, and parsed, for older callers. Compiled Babel patterns and locales are kept
+    per format and locale, and formatted strings are memoized, since a page of shows repeats
+    the same few dates many times. Babel and dateutil are imported on first use, so that importing
+    the app (and forking a worker) does not pay for them.
+"""
+
+from datetime import date, datetime, time
+from functools import lru_cache
+
+
+# Named formats of the 'datetime' filter. Any other format is used as a Babel pattern.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = 'en'
+
+
+@lru_cache(maxsize=None)
+def _pattern(format):
+    from babel.dates import parse_pattern
+
+    return parse_pattern(FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=None)
+def _locale(locale):
+    from babel import Locale
+
+    return Locale.parse(locale)
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale):
+    return _pattern(format).apply(value, _locale(locale))
+
+
+def to_datetime(value):
+    """Turns a date, a datetime or a date string into a datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time())
+    import dateutil.parser
+
+    return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale=DEFAULT_LOCALE):
+    """
+        Formats a date for display
+        ----
+        Args
+        ----
+            value (date, datetime or string): The date to format
+            format (string): 'full', 'medium' or a Babel date pattern
+            locale (string): The locale of month and day names
+        -------
+        Returns
+        -------
+            text (string): The formatted date
+    """
+    return _format(to_datetime(value), format, locale)
+
+
+def cache_info():
+    """Hit and miss counters of the memoized formatting"""
+    return {'patterns': _pattern.cache_info()._asdict(), 'formatted': _format.cache_info()._asdict()}
+
+
+def clear_caches():
+    """Forgets every compiled pattern, locale and formatted string"""
+    _pattern.cache_clear()
+    _locale.cache_clear()
+    _format.cache_clear()
@@ -1,25 +1,38 @@
 from datetime import datetime
 from flask_wtf import Form
-from pyparsing import Regex
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Optional, ValidationError
 
 
 phone_regex = "^[\+]?[(]?[0-9]{3}[)]?[-\s\.]?[0-9]{3}[-\s\.]?[0-9]{4,6}$"
 message = "Please enter a correct phone number!"
+# Accepted show times, with or without seconds
+SHOW_TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M']
+id_regex = r'^\d+$'
 
 class ShowForm(Form):
     artist_id = StringField(
-    'artist_id'
+    'artist_id', validators=[DataRequired(), Regexp(id_regex, message="Please enter a numeric artist ID!")]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id', validators=[DataRequired(), Regexp(id_regex, message="Please enter a numeric venue ID!")]
     )
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default= datetime.today(),
+        format=SHOW_TIME_FORMATS
     )
+    # Optional: without it the show lasts SHOW_DEFAULT_DURATION_MINUTES
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()],
+        format=SHOW_TIME_FORMATS
+    )
+
+    def validate_end_time(self, field):
+        if self.start_time.data and field.data and field.data <= self.start_time.data:
+            raise ValidationError('The show must end after it starts.')
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,110 @@
+"""
+This module adds a fragment cache to the Jinja templates.
+    A template wraps an expensive block in
+        {% cache 'show-tile', show %} ... {% endcache %}
+    and the rendered HTML is stored under a hash of the template location and of the values after
+    'cache'. The values are the version of the fragment: pass the rows the block renders (or a
+    version stamp), so that any change to them renders the block again instead of reusing it.
+    Fragments are kept per process in an LRU bounded by their total size (FRAGMENT_CACHE_MAX_BYTES).
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from caching import CacheStats
+
+
+class FragmentCache:
+    """An LRU of rendered HTML fragments whose total size stays under max_bytes"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.size = 0
+        self.evictions = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is not None:
+                self._fragments.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        if len(html) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._fragments:
+                self.size -= len(self._fragments.pop(key))
+            self._fragments[key] = html
+            self.size += len(html)
+            while self.size > self.max_bytes:
+                _, evicted = self._fragments.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self.size = 0
+
+    def info(self):
+        return {'entries': len(self._fragments), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'evictions': self.evictions, **self.stats.as_dict()}
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the {% cache value, ... %} ... {% endcache %} tag"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        values = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            values.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        # Two blocks given the same values in different places must not share a fragment
+        location = nodes.Const('%s:%d' % (parser.name, lineno))
+        return nodes.CallBlock(
+            self.call_method('_render', [location, nodes.List(values)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, location, values, caller):
+        fragment_cache = self.environment.fragment_cache
+        key = hashlib.sha1(repr((location, values)).encode()).hexdigest()
+        html = fragment_cache.get(key)
+        if html is not None:
+            fragment_cache.stats.incr('hits')
+            return html
+        fragment_cache.stats.incr('misses')
+        html = caller()
+        fragment_cache.set(key, html)
+        fragment_cache.stats.incr('sets')
+        return html
+
+
+def init_fragment_cache(app):
+    """
+        Enables the {% cache %} tag in the app templates
+        ----
+        Args
+        ----
+            app (Flask): The Flask app (FRAGMENT_CACHE_MAX_BYTES)
+        -------
+        Returns
+        -------
+            fragment_cache (FragmentCache): The store of rendered fragments
+    """
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache.max_bytes = app.config['FRAGMENT_CACHE_MAX_BYTES']
+    return app.jinja_env.fragment_cache
@@ -1,134 +1,422 @@
-from datetime import date
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
 import itertools
+import json
 import operator
 
-from sqlalchemy import select
+from sqlalchemy import case, func, select, true, tuple_
 
+import search
 
-def get_venues_by_city_and_state(db, app_model):
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def start_of_today():
+    """Midnight today: shows starting from then on are upcoming, earlier ones are past"""
+    return datetime.combine(date.today(), time())
+
+
+def encode_cursor(values):
     """
-        Gets the list of venues grouped by city and state
+        Encodes the sort key values of a row into an opaque URL-safe cursor
         ----
         Args
         ----
-            db (SQLAlchemy): The ORM postgres object
-            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            values (tuple): The sort key values of the row
         -------
         Returns
         -------
-            venue_list (dict): A list of all venues grouped by city and state.
+            cursor (string): The encoded cursor
     """
-    query_result = db.session.query(app_model.Venue.city, app_model.Venue.state, app_model.Venue.id, app_model.Venue.name)
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
 
-    venue_list = []  # Create an empty list to append the regrouped query result
 
-    # Sorts by city and groups by city
-    for i, g in itertools.groupby(sorted(query_result, key=operator.itemgetter("city"), reverse=True), key=operator.itemgetter("city")):
-        sub_object = list(g)
-        venues = [{'id': obj['id'], 'name': obj['name']} for obj in sub_object]
-        adict = {
-            'city': i,
-            'state': sub_object[0]['state'],
-            'venues': venues
-        }
-        venue_list.append(adict)
-
-    return venue_list
-
-
-def search_venue(db, app_model, search_term):
-    """Implements a search query for listed venues
+def decode_cursor(cursor, sort_columns):
+    """
+        Decodes a cursor produced by encode_cursor back into sort key values
+        ----
+        Args
+        ----
+            cursor (string): The encoded cursor
+            sort_columns (list): The columns the cursor was built from
+        -------
+        Returns
+        -------
+            values (tuple): The sort key values, converted to the column types
+        ------
+        Raises
+        ------
+            ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(sort_columns):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for column, value in zip(sort_columns, values):
+        if value is not None:
+            value = _cursor_value(column.type.python_type, value)
+        decoded.append(value)
+    return tuple(decoded)
+
+
+def _cursor_value(python_type, value):
+    # Cursors come from the URL, so a value of another type must not reach the SQL query
+    if python_type in (date, datetime):
+        if not isinstance(value, str):
+            raise ValueError('Invalid cursor')
+        try:
+            return python_type.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+    if python_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    # bool is a subclass of int, so an int column must not accept true or false
+    if not isinstance(value, python_type) or (python_type is int and isinstance(value, bool)):
+        raise ValueError('Invalid cursor')
+    return value
+
+
+def paginate_keyset(query, sort_columns, page_size, after=None, before=None):
+    """
+        Returns one page of a query using keyset (cursor) pagination.
+        The page is selected with a tuple comparison on the sort key, so every page costs
+        the same no matter how deep into the result set it is.
+        ----
+        Args
+        ----
+            query (Query): The query to paginate. It must select every column in sort_columns
+            sort_columns (list): Columns forming a unique, stable sort key (end with the primary key)
+            page_size (int): The maximum number of rows in a page
+            after (string): Cursor of the row after which the page starts
+            before (string): Cursor of the row before which the page ends
+        -------
+        Returns
+        -------
+            page (Page): The rows of the page with the cursors of the next and previous pages
+    """
+    key = tuple_(*sort_columns)
+    if before:
+        query = query.filter(key < decode_cursor(before, sort_columns)).order_by(
+            *[column.desc() for column in sort_columns])
+    else:
+        if after:
+            query = query.filter(key > decode_cursor(after, sort_columns))
+        query = query.order_by(*sort_columns)
+
+    rows = query.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    def row_cursor(row):
+        return encode_cursor([row._mapping[column] for column in sort_columns])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or before:
+            next_cursor = row_cursor(rows[-1])
+        if after or (before and has_more):
+            prev_cursor = row_cursor(rows[0])
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def get_venues_by_city_and_state(db, app_model, page_size, after=None, before=None, venues_limit=10):
+    """
+        Gets a page of areas (state and city), each with its venue count and first venues.
+        The grouping is done by the database, so the cost follows the number of areas shown
+        rather than the total number of venues.
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            page_size (int): The maximum number of areas in the page
+            after, before (string): Keyset cursors, see paginate_keyset
+            venues_limit (int): The maximum number of venues listed per area
+        -------
+        Returns
+        -------
+            page (Page): A page whose items are areas: dicts of city, state, venue_count and venues.
+    """
+    Venue = app_model.Venue
+    area_query = db.session.query(
+        Venue.state, Venue.city, func.count(Venue.id).label('venue_count')).group_by(Venue.state, Venue.city)
+    page = paginate_keyset(area_query, [Venue.state, Venue.city], page_size, after=after, before=before)
+    if not page.items:
+        return page._replace(items=[])
+
+    # The first venues of every area of the page, numbered within their area
+    position = func.row_number().over(partition_by=(Venue.state, Venue.city), order_by=Venue.id).label('position')
+    first, last = page.items[0], page.items[-1]
+    area_range = tuple_(Venue.state, Venue.city).between(
+        tuple_(first.state, first.city), tuple_(last.state, last.city))
+    numbered = db.session.query(Venue.state, Venue.city, Venue.id, Venue.name, position).filter(area_range).subquery()
+    venue_rows = db.session.query(numbered.c.state, numbered.c.city, numbered.c.id, numbered.c.name).filter(
+        numbered.c.position <= venues_limit).order_by(numbered.c.state, numbered.c.city, numbered.c.id)
+
+    venues_by_area = {}
+    for (state, city), g in itertools.groupby(venue_rows, key=operator.itemgetter(0, 1)):
+        venues_by_area[(state, city)] = [{'id': row.id, 'name': row.name} for row in g]
+
+    venue_list = [{
+        'city': area.city,
+        'state': area.state,
+        'venue_count': area.venue_count,
+        'venues': venues_by_area.get((area.state, area.city), [])
+    } for area in page.items]
+
+    return page._replace(items=venue_list)
+
+
+def get_area_venues(db, app_model, state, city, page_size, after=None, before=None):
+    """
+        Gets a page of the venues of one area
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            state, city (string): The area
+            page_size (int): The maximum number of venues in the page
+            after, before (string): Keyset cursors, see paginate_keyset
+        -------
+        Returns
+        -------
+            page (Page): A page whose only item is the area, with its venue_count and the venues of the page.
+    """
+    Venue = app_model.Venue
+    area_filter = (Venue.state == state, Venue.city == city)
+    venue_count = db.session.query(func.count(Venue.id)).filter(*area_filter).scalar()
+    page = paginate_keyset(
+        db.session.query(Venue.id, Venue.name).filter(*area_filter), [Venue.id],
+        page_size, after=after, before=before)
+
+    area = {
+        'city': city,
+        'state': state,
+        'venue_count': venue_count,
+        'venues': [{'id': row.id, 'name': row.name} for row in page.items]
+    }
+    return page._replace(items=[area] if venue_count else [])
+
+
+def search_venue(db, app_model, search_term, limit=50, cache=None):
+    """Implements a ranked search on the name, city, state and genres of listed venues
         ----
         Args
         ----
             db (SQLAlchemy): The ORM postgres object
             app_model (flask_alchemy_model): The app_model references the venue table in the database
             search_term (string): The search keyword
+            limit (int): The maximum number of results returned
+            cache (NullCache): The cache backend holding the version stamps, which tell an in-process index
+                that the venues changed
         -------
         Returns
         -------
-            search_result (dict): A dictionary of the search query
+            search_result (dict): count of all matching venues and data, the best ranked of them
     """
-    all_Venues = db.session.query(app_model.Venue.city, app_model.Venue.id, app_model.Venue.name).filter(
-        app_model.Venue.name.ilike("%"+search_term+"%")).all()
-
-    search_result = []
-
-    for _, g in itertools.groupby(all_Venues, key=operator.itemgetter("city")):
-        count = len(all_Venues)
-        sub_object = list(g)
-        data = [{'id': obj['id'], 'name': obj['name']}
-                for obj in sub_object]
-        adict = {
-            'count': count,
-            'data': data
-        }
-        search_result.append(adict)
-
-    return search_result
+    return search.get_backend(db).search(db, app_model.Venue, search_term, limit, cache=cache)
 
 
-def search_artist(db, app_model, search_term):
-    """Implements a search query for listed artists
+def search_artist(db, app_model, search_term, limit=50, cache=None):
+    """Implements a ranked search on the name, city, state and genres of listed artists
         ----
         Args
         ----
             db (SQLAlchemy): The ORM postgres object
             app_model (flask_alchemy_model): The Artist object references the artist table in the database
             search_term (string): The search keyword
+            limit (int): The maximum number of results returned
+            cache (NullCache): The cache backend holding the version stamps, which tell an in-process index
+                that the artists changed
         -------
         Returns
         -------
-            search_result (dict): A dictionary of the search query
+            search_result (dict): count of all matching artists and data, the best ranked of them
     """
-    artist_search = db.session.query(app_model.Artist.id, app_model.Artist.name).filter(
-        app_model.Artist.name.ilike("%"+search_term+"%")).all()
-
-    search_list = []
-    for artist in artist_search:
-        search_list.append(artist._asdict)
-
-    search_result = []
-    for _, g in itertools.groupby(sorted(artist_search, key=operator.itemgetter("id"), reverse=True)):
-        count = len(search_list)
-        sub_object = list(g)
-        data = [{'id': obj['id'], 'name': obj['name']} for obj in sub_object]
-        artist_search_dict = {
-            **sub_object[0],
-            'count': count,
-            'data': data
-        }
-        search_result.append(artist_search_dict)
+    return search.get_backend(db).search(db, app_model.Artist, search_term, limit, cache=cache)
 
-    return search_result
 
-
-def get_artist(db, app_model):
+def get_artist(db, app_model, page_size, after=None, before=None):
     """
-       Gets the list of all registered artists
+       Gets a page of registered artists ordered by name
        ----
        Args
        ----
            db (SQLAlchemy): The ORM postgres object
            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+           page_size (int): The maximum number of artists in the page
+           after, before (string): Keyset cursors, see paginate_keyset
        -------
        Returns
        -------
-           artist_list (list): A list of dictionaries of all artists.
+           page (Page): A page whose items are dictionaries of artists.
    """
     artist_query = db.session.query(app_model.Artist.id, app_model.Artist.name)
+    page = paginate_keyset(
+        artist_query, [app_model.Artist.name, app_model.Artist.id],
+        page_size, after=after, before=before)
 
     artist_list = []
-    for row in artist_query:
-        artist_list.append(row.asdict())
+    for row in page.items:
+        artist_list.append(row._asdict())
+
+    return page._replace(items=artist_list)
+
+
+def _venue_detail_columns(app_model):
+    """Columns describing a venue on its detail page"""
+    return (app_model.Venue.id, app_model.Venue.name, app_model.Venue.city, app_model.Venue.state, app_model.Venue.address, app_model.Venue.phone, app_model.Venue.genres, app_model.Venue.image_link,
+            app_model.Venue.facebook_link, app_model.Venue.website, app_model.Venue.seeking_talent, app_model.Venue.seeking_description)
 
-    return artist_list
+
+def _artist_detail_columns(app_model):
+    """Columns describing an artist on its detail page"""
+    return (app_model.Artist.id, app_model.Artist.name, app_model.Artist.city, app_model.Artist.state, app_model.Artist.phone, app_model.Artist.genres, app_model.Artist.image_link,
+            app_model.Artist.facebook_link, app_model.Artist.website, app_model.Artist.seeking_venue, app_model.Artist.seeking_description)
+
+
+def _split_shows(rows, table_id, table_name, table_image_link, today):
+    """
+       Splits show rows into past and upcoming shows and counts both
+       ----
+       Args
+       ----
+           rows (iterable): Rows (dicts) holding the show columns and a start_time
+           table_id, table_name, table_image_link (string): Keys of the counterpart columns
+           today (datetime): The time that separates past shows from upcoming ones
+       -------
+       Returns
+       -------
+           show_split (dict): past_shows, upcoming_shows, past_shows_count and upcoming_shows_count
+   """
+    upcoming_shows = []
+    past_shows = []
+    for obj in rows:
+        start_time = obj['start_time']
+        if start_time is None:
+            continue
+
+        show = {table_id: obj[table_id], table_name: obj[table_name],
+                table_image_link: obj[table_image_link],
+                'start_time': start_time}
+        if start_time < today:
+            past_shows.append(show)
+        else:
+            upcoming_shows.append(show)
+
+    return {
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows)
+    }
+
+
+def _show_row(row, table_id, table_name, table_image_link):
+    """Turns a show row of a detail page into the dictionary the templates expect"""
+    return {table_id: row[0], table_name: row[1], table_image_link: row[2],
+            'start_time': row[3]}
+
+
+def get_venue_OR_artist_detail(db, app_model, entity_id, for_venue_id=False, for_artist_id=False, shows_limit=12):
+    """
+       Gets the full details of a single venue or artist by its primary key.
+       The past and upcoming show counts are conditional aggregates computed by the database,
+       and each show list is a separate ordered query capped at shows_limit rows, so a venue
+       with thousands of past shows costs the same as one with a handful.
+       ----
+       Args
+       ----
+           db (SQLAlchemy): The ORM postgres object
+           app_model (flask_alchemy_model): The app_model object references the tables in the database.
+           entity_id (int): The ID of the venue or artist
+           for_venue_id (boolean): Uses the venue syntax to get the venue details
+           for_artist_id (boolean): Uses the artist syntax to get the artist details
+           shows_limit (int): The maximum number of past and of upcoming shows returned
+       -------
+       Returns
+       -------
+           details (dict): The entity details with its latest past shows, next upcoming shows and counts of both,
+                           or None if the ID does not exist
+   """
+    Show = app_model.Show
+    if for_venue_id:
+        entity_columns = _venue_detail_columns(app_model)
+        entity_filter = app_model.Venue.id == entity_id
+        show_filter = Show.venue_id == entity_id
+        other, other_join = app_model.Artist, app_model.Artist.id == Show.artist_id
+        show_query = db.session.query(
+            Show.artist_id,
+            app_model.Artist.name.label("artist_name"),
+            app_model.Artist.image_link.label("artist_image_link"),
+            Show.start_time).join(other, other_join)
+
+        table_id = 'artist_id'
+        table_name = 'artist_name'
+        table_image_link = 'artist_image_link'
+
+    elif for_artist_id:
+        entity_columns = _artist_detail_columns(app_model)
+        entity_filter = app_model.Artist.id == entity_id
+        show_filter = Show.artist_id == entity_id
+        other, other_join = app_model.Venue, app_model.Venue.id == Show.venue_id
+        show_query = db.session.query(
+            Show.venue_id,
+            app_model.Venue.name.label("venue_name"),
+            app_model.Venue.image_link.label("venue_image_link"),
+            Show.start_time).join(other, other_join)
+
+        table_id = 'venue_id'
+        table_name = 'venue_name'
+        table_image_link = 'venue_image_link'
+
+    else:
+        raise ValueError('Either for_venue_id or for_artist_id must be set')
+
+    today = start_of_today()
+    is_past = Show.start_time < today
+    is_upcoming = Show.start_time >= today
+    # Counted over the same join as the lists, so the shows of a deleted venue or artist are left out of both
+    counts = db.session.query(
+        func.count(case((is_past, 1))).label('past_shows_count'),
+        func.count(case((is_upcoming, 1))).label('upcoming_shows_count')).select_from(Show).join(
+        other, other_join).filter(show_filter).subquery()
+
+    # The counts subquery returns exactly one row
+    entity = db.session.query(*entity_columns, counts.c.past_shows_count, counts.c.upcoming_shows_count).join(
+        counts, true()).filter(entity_filter).first()
+    if entity is None:
+        return None
+
+    details = entity._asdict()
+    show_query = show_query.filter(show_filter)
+    # Skip the list queries when the counts already say they are empty
+    details['past_shows'] = [
+        _show_row(row, table_id, table_name, table_image_link)
+        for row in show_query.filter(is_past).order_by(Show.start_time.desc()).limit(shows_limit)
+    ] if details['past_shows_count'] else []
+    details['upcoming_shows'] = [
+        _show_row(row, table_id, table_name, table_image_link)
+        for row in show_query.filter(is_upcoming).order_by(Show.start_time).limit(shows_limit)
+    ] if details['upcoming_shows_count'] else []
+    return details
 
 
 def show_venue_OR_artist_details(db, app_model, for_venue_id=False, for_artist_id=False):
     """
-       Gets the full details of each selected venue or artist from the db by filtering by ID.
-       The details includes past shows, upcoming shows, and counts of both
+       Gets the full details of EVERY venue or artist in the db (bulk mode, e.g. for exports).
+       The details includes past shows, upcoming shows, and counts of both.
+       Use get_venue_OR_artist_detail to render a single detail page.
        ----
        Args
        ----
@@ -139,12 +427,11 @@ def show_venue_OR_artist_details(db, app_model, for_venue_id=False, for_artist_i
        -------
        Returns
        -------
-           regrouped_data_list (dict):  A dic
+           regrouped_data_list (list): A list of dictionaries, one per venue or artist
    """
     if for_venue_id:
             query = db.session.query(
-            app_model.Venue.id, app_model.Venue.name, app_model.Venue.city, app_model.Venue.state, app_model.Venue.address, app_model.Venue.phone, app_model.Venue.genres, app_model.Venue.image_link,
-            app_model.Venue.facebook_link, app_model.Venue.website, app_model.Venue.seeking_talent, app_model.Venue.seeking_description,
+            *_venue_detail_columns(app_model),
             app_model.Show.artist_id,
             app_model.Artist.name.label("artist_name"),
             app_model.Artist.image_link.label("artist_image_link"),
@@ -158,8 +445,7 @@ def show_venue_OR_artist_details(db, app_model, for_venue_id=False, for_artist_i
 
     if for_artist_id:
             query = db.session.query(
-            app_model.Artist.id, app_model.Artist.name, app_model.Artist.city, app_model.Artist.state, app_model.Artist.phone, app_model.Artist.genres, app_model.Artist.image_link,
-            app_model.Artist.facebook_link, app_model.Artist.website, app_model.Artist.seeking_venue, app_model.Artist.seeking_description,
+            *_artist_detail_columns(app_model),
             app_model.Show.venue_id,
             app_model.Venue.name.label("venue_name"),
             app_model.Venue.image_link.label("venue_image_link"),
@@ -180,7 +466,7 @@ def show_venue_OR_artist_details(db, app_model, for_venue_id=False, for_artist_i
         'id') != None]  # Delete ID's that are None based on the result of a full join query
 
     regrouped_data_list = []
-    today = date.today()
+    today = start_of_today()
 
     for _, g in itertools.groupby(
             sorted(data_list, key=operator.itemgetter("id"), reverse=False),
@@ -189,65 +475,362 @@ def show_venue_OR_artist_details(db, app_model, for_venue_id=False, for_artist_i
 
         sub_object = list(g)
 
-        upcoming_shows = []
-        past_shows = []
-        past_shows_count = 0
-        upcoming_shows_count = 0
-        for obj in sub_object:
-            _, start_time = obj['id'], obj['start_time']
-            if start_time is None:
-                upcoming_shows = []
-                past_shows = []
-
-            elif start_time < today:
-                past_shows.append(
-                    {table_id: obj[table_id], table_name: obj[table_name],
-                     table_image_link: obj[table_image_link],
-                     'start_time': start_time.strftime('%m/%d/%Y')}
-                )
-                past_shows_count += 1
-
-            else:
-                upcoming_shows.append(
-                    {table_id: obj[table_id], table_name: obj[table_name],
-                     table_image_link: obj[table_image_link],
-                     'start_time': start_time.strftime('%m/%d/%Y')}
-                )
-                upcoming_shows_count += 1
-
         adict = {
             **sub_object[0],
-            'past_shows': past_shows,
-            'upcoming_shows': upcoming_shows,
-            'past_shows_count': past_shows_count,
-            'upcoming_shows_count': upcoming_shows_count
+            **_split_shows(sub_object, table_id, table_name, table_image_link, today)
         }
         regrouped_data_list.append(adict)
     return regrouped_data_list
 
 
-def get_shows(db, app_model):
+def get_shows(db, app_model, page_size, after=None, before=None, venue_id=None, artist_id=None, upcoming=None):
     """
-        Gets the list of scheduled shows across various venues        ----
+        Gets a page of scheduled shows across various venues ordered by start time
+        ----
         Args
         ----
             db (SQLAlchemy): The ORM postgres object
             app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            page_size (int): The maximum number of shows in the page
+            after, before (string): Keyset cursors, see paginate_keyset
+            venue_id, artist_id (int): Only list the shows of this venue or artist
+            upcoming (boolean): Only list upcoming (True) or past (False) shows
         -------
         Returns
         -------
-            venue_list (dict): A list of all venues grouped by city and state.
+            page (Page): A page whose items are dictionaries of shows.
     """
+    feed = app_model.ShowFeed
     query = db.session.query(
-        app_model.Show.venue_id,
-        app_model.Venue.name.label("venue_name"),
-        app_model.Show.artist_id,
-        app_model.Artist.name.label("artist_name"),
-        app_model.Artist.image_link.label(
-            "artist_image_link"),
-        app_model.Show.start_time).join(app_model.Venue, app_model.Venue.id == app_model.Show.venue_id).join(app_model.Artist, app_model.Artist.id == app_model.Show.artist_id)
+        feed.id, feed.venue_id, feed.venue_name, feed.artist_id, feed.artist_name, feed.artist_image_link,
+        feed.start_time)
+    if venue_id is not None:
+        query = query.filter(feed.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(feed.artist_id == artist_id)
+    if upcoming is True:
+        query = query.filter(feed.start_time >= start_of_today())
+    elif upcoming is False:
+        query = query.filter(feed.start_time < start_of_today())
+    page = paginate_keyset(query, [feed.start_time, feed.id], page_size, after=after, before=before)
 
     data = []
-    for show in query:
+    for show in page.items:
         data.append(show._asdict())
-    return data
+    return page._replace(items=data)
+
+
+CALENDAR_VIEWS = ('day', 'week', 'month')
+
+
+def calendar_range(view, day):
+    """
+        The dates covered by the calendar day, week (Monday to Sunday) or month containing a day
+        ----
+        Args
+        ----
+            view (string): 'day', 'week' or 'month'
+            day (date): A day of the period
+        -------
+        Returns
+        -------
+            start, end (date): The first day of the period and the day after its last day
+    """
+    if view == 'day':
+        start = day
+        end = day + timedelta(days=1)
+    elif view == 'week':
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    elif view == 'month':
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError('Unknown calendar view: %s' % view)
+    return start, end
+
+
+def _calendar_query(db, app_model, columns, start, end, venue_id=None, artist_id=None, city=None, state=None):
+    # A half-open range on start_time, so each filter is answered by a range scan of one of the
+    # (filter, start_time, id) show feed indexes
+    feed = app_model.ShowFeed
+    query = db.session.query(*columns).filter(
+        feed.start_time >= datetime.combine(start, time()), feed.start_time < datetime.combine(end, time()))
+    if venue_id is not None:
+        query = query.filter(feed.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(feed.artist_id == artist_id)
+    if city:
+        query = query.filter(feed.venue_city == city)
+    if state:
+        query = query.filter(feed.venue_state == state)
+    return query
+
+
+def get_calendar(db, app_model, start, end, page_size, after=None, before=None, venue_id=None, artist_id=None,
+                 city=None, state=None):
+    """
+        Gets a page of the shows starting between two dates, ordered by start time
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            start, end (date): The first day of the range and the day after its last day
+            page_size (int): The maximum number of shows in the page
+            after, before (string): Keyset cursors, see paginate_keyset
+            venue_id, artist_id (int): Only list the shows of this venue or artist
+            city, state (string): Only list the shows at venues of this city or state
+        -------
+        Returns
+        -------
+            page (Page): A page whose items are dictionaries of shows.
+    """
+    feed = app_model.ShowFeed
+    query = _calendar_query(
+        db, app_model,
+        [feed.id, feed.venue_id, feed.venue_name, feed.venue_city, feed.venue_state, feed.artist_id,
+         feed.artist_name, feed.artist_image_link, feed.start_time],
+        start, end, venue_id=venue_id, artist_id=artist_id, city=city, state=state)
+    page = paginate_keyset(query, [feed.start_time, feed.id], page_size, after=after, before=before)
+    return page._replace(items=[show._asdict() for show in page.items])
+
+
+def get_calendar_day_counts(db, app_model, start, end, venue_id=None, artist_id=None, city=None, state=None):
+    """
+        Counts the shows of every day between two dates, in one grouped scan of the range
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            start, end (date): The first day of the range and the day after its last day
+            venue_id, artist_id (int): Only count the shows of this venue or artist
+            city, state (string): Only count the shows at venues of this city or state
+        -------
+        Returns
+        -------
+            counts (dict): The number of shows by ISO date, for every day of the range
+    """
+    day = func.date(app_model.ShowFeed.start_time)
+    rows = _calendar_query(
+        db, app_model, [day, func.count()], start, end,
+        venue_id=venue_id, artist_id=artist_id, city=city, state=state).group_by(day)
+
+    counts = {(start + timedelta(days=offset)).isoformat(): 0 for offset in range((end - start).days)}
+    for show_day, count in rows:
+        # SQLite returns the date as text
+        counts[show_day if isinstance(show_day, str) else show_day.isoformat()] = count
+    return counts
+
+
+def refresh_show_feed(db, app_model, show_ids=None):
+    """
+        Rebuilds show feed rows from the shows, venues and artists tables, in the current transaction
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            show_ids (list): The shows to rebuild, or None to rebuild the whole feed
+    """
+    feed = app_model.ShowFeed.__table__
+    source = select(
+        app_model.Show.id,
+        app_model.Show.venue_id,
+        app_model.Venue.name,
+        app_model.Venue.city,
+        app_model.Venue.state,
+        app_model.Show.artist_id,
+        app_model.Artist.name,
+        app_model.Artist.image_link,
+        app_model.Show.start_time).join(app_model.Venue, app_model.Venue.id == app_model.Show.venue_id).join(
+            app_model.Artist, app_model.Artist.id == app_model.Show.artist_id)
+    delete = feed.delete()
+    if show_ids is not None:
+        source = source.where(app_model.Show.id.in_(show_ids))
+        delete = delete.where(feed.c.id.in_(show_ids))
+    db.session.execute(delete)
+    db.session.execute(feed.insert().from_select(
+        ['id', 'venue_id', 'venue_name', 'venue_city', 'venue_state', 'artist_id', 'artist_name', 'artist_image_link',
+         'start_time'], source))
+
+
+def update_show_feed(db, app_model, venue=None, artist=None, deleted=False):
+    """
+        Copies a venue or artist change to its show feed rows, in the current transaction
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            venue (Venue): The edited or deleted venue
+            artist (Artist): The edited or deleted artist
+            deleted (boolean): The venue or artist is being deleted, so its shows leave the feed
+    """
+    feed = app_model.ShowFeed
+    if venue is not None:
+        rows = db.session.query(feed).filter(feed.venue_id == venue.id)
+        values = {'venue_name': venue.name, 'venue_city': venue.city, 'venue_state': venue.state}
+    else:
+        rows = db.session.query(feed).filter(feed.artist_id == artist.id)
+        values = {'artist_name': artist.name, 'artist_image_link': artist.image_link}
+    if deleted:
+        rows.delete(synchronize_session=False)
+    else:
+        rows.update(values, synchronize_session=False)
+
+
+def parse_genres(value):
+    """
+        Reads the genres of a venue or artist
+        ----
+        Args
+        ----
+            value (string or list): A genres column value such as {Jazz,"Rock n Roll"}, or a list of genres
+        -------
+        Returns
+        -------
+            genres (list): The genre names, in their original order, without duplicates
+    """
+    if isinstance(value, str):
+        value = value.strip().strip('{}').split(',')
+    genres = []
+    for genre in value or ():
+        genre = genre.strip().strip('"').strip()
+        if genre and genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def genres_literal(genres):
+    """Formats a list of genres the way the genres column stores them, e.g. {Jazz,"Rock n Roll"}"""
+    return '{%s}' % ','.join('"%s"' % genre if ' ' in genre or ',' in genre else genre for genre in genres)
+
+
+def get_genres(db, app_model, names):
+    """
+        Returns the Genre rows of the given names, creating the missing ones
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            names (list): The genre names
+        -------
+        Returns
+        -------
+            genres (list): The Genre objects, in the order of names
+    """
+    existing = {genre.name: genre for genre in
+                db.session.query(app_model.Genre).filter(app_model.Genre.name.in_(names))} if names else {}
+    for name in names:
+        if name not in existing:
+            existing[name] = app_model.Genre(name=name)
+            db.session.add(existing[name])
+    return [existing[name] for name in names]
+
+
+def set_genres(db, app_model, entity, genres):
+    """
+        Sets the genres of a venue or artist, both the display column and the genre links
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            entity (Venue or Artist): The venue or artist
+            genres (list): The genre names, e.g. from request.form.getlist('genres')
+    """
+    genres = parse_genres(genres)
+    entity.genres = genres_literal(genres)
+    entity.tagged_genres = get_genres(db, app_model, genres)
+
+
+def rebuild_genre_links(db, app_model, model):
+    """
+        Recreates the genre links of every venue or artist from its genres column,
+        after rows were inserted without the ORM (bulk imports, benchmark seeding).
+        Runs in the current transaction.
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            model (db.Model): The Venue or Artist model
+    """
+    links, key = (app_model.venue_genres, 'venue_id') if model is app_model.Venue else (app_model.artist_genres, 'artist_id')
+    rows = [(row.id, parse_genres(row.genres)) for row in db.session.query(model.id, model.genres)]
+    genres = get_genres(db, app_model, sorted({genre for _, genres in rows for genre in genres}))
+    db.session.flush()
+    genre_ids = {genre.name: genre.id for genre in genres}
+
+    db.session.execute(links.delete())
+    values = [{key: entity_id, 'genre_id': genre_ids[genre]} for entity_id, genres in rows for genre in genres]
+    for start in range(0, len(values), 5000):
+        db.session.execute(links.insert(), values[start:start + 5000])
+
+
+def get_genre_counts(db, app_model):
+    """
+        Gets every genre with its number of venues and of artists, counted on the genre link indexes
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+        -------
+        Returns
+        -------
+            genres (list): Dictionaries with the genre name, venue_count and artist_count, ordered by name
+    """
+    venue_counts = select(app_model.venue_genres.c.genre_id, func.count().label('venue_count')).group_by(
+        app_model.venue_genres.c.genre_id).subquery()
+    artist_counts = select(app_model.artist_genres.c.genre_id, func.count().label('artist_count')).group_by(
+        app_model.artist_genres.c.genre_id).subquery()
+    rows = db.session.query(
+        app_model.Genre.name,
+        func.coalesce(venue_counts.c.venue_count, 0).label('venue_count'),
+        func.coalesce(artist_counts.c.artist_count, 0).label('artist_count')).outerjoin(
+        venue_counts, venue_counts.c.genre_id == app_model.Genre.id).outerjoin(
+        artist_counts, artist_counts.c.genre_id == app_model.Genre.id).order_by(app_model.Genre.name)
+    return [row._asdict() for row in rows]
+
+
+def get_genre_members(db, app_model, genre, page_size, after=None, before=None,
+                      for_venues=False, for_artists=False, state=None, city=None):
+    """
+        Gets a page of the venues or artists tagged with a genre, optionally in one state or city.
+        The page is read from the genre link index in venue or artist id order.
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            genre (string): The genre name
+            page_size (int): The maximum number of venues or artists in the page
+            after, before (string): Keyset cursors, see paginate_keyset
+            for_venues, for_artists (boolean): Which of venues or artists to list
+            state, city (string): Only list the venues or artists of this state, or of this city
+        -------
+        Returns
+        -------
+            page (Page): A page whose items are dictionaries with the id, name, city and state,
+                or None when the genre does not exist
+    """
+    genre_id = db.session.query(app_model.Genre.id).filter(app_model.Genre.name == genre).scalar()
+    if genre_id is None:
+        return None
+
+    model, links, key = ((app_model.Venue, app_model.venue_genres, 'venue_id') if for_venues
+                         else (app_model.Artist, app_model.artist_genres, 'artist_id'))
+    link_id = links.c[key]
+    query = db.session.query(link_id, model.name, model.city, model.state).join(
+        model, model.id == link_id).filter(links.c.genre_id == genre_id)
+    if state:
+        query = query.filter(model.state == state)
+    if city:
+        query = query.filter(model.city == city)
+    page = paginate_keyset(query, [link_id], page_size, after=after, before=before)
+    return page._replace(items=[{'id': row[0], 'name': row.name, 'city': row.city, 'state': row.state}
+                                for row in page.items])
@@ -0,0 +1,221 @@
+"""
+This module measures where the time of each request goes.
+    For every request it records the number of SQL statements, the total SQL time, the slowest
+    statement, the template render time and the total latency. Each record is
+        - written as one JSON log line on the 'fyyur.requests' logger (WARNING when flagged),
+        - kept in an in-memory ring buffer that summary() aggregates per endpoint,
+        - sent back in X-Query-Count / Server-Timing headers when INSTRUMENTATION_HEADERS is on.
+    The record of a streamed page is completed once its body is sent, so it includes the rendering,
+    but the page gets no instrumentation headers.
+    A request is flagged when it runs more than SLOW_REQUEST_QUERIES statements or takes longer
+    than SLOW_REQUEST_MS.
+"""
+
+from collections import deque
+import json
+import logging
+import statistics
+import threading
+import time
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger('fyyur.requests')
+
+
+class RequestLog:
+    """A thread-safe ring buffer holding the records of the most recent requests"""
+
+    def __init__(self, size=1000):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """
+            Aggregates the buffered records per endpoint
+            -------
+            Returns
+            -------
+                summary (dict): Per endpoint request count, flagged count, query counts and latency percentiles
+        """
+        by_endpoint = {}
+        for record in self.records():
+            by_endpoint.setdefault(record['endpoint'], []).append(record)
+
+        summary = {}
+        for endpoint, records in sorted(by_endpoint.items()):
+            latencies = sorted(record['total_ms'] for record in records)
+            queries = [record['queries'] for record in records]
+            summary[endpoint] = {
+                'requests': len(records),
+                'flagged': sum(1 for record in records if record['flagged']),
+                'queries_avg': round(statistics.fmean(queries), 2),
+                'queries_max': max(queries),
+                'sql_ms_avg': round(statistics.fmean(record['sql_ms'] for record in records), 3),
+                'render_ms_avg': round(statistics.fmean(record['render_ms'] for record in records), 3),
+                'latency_ms_p50': latencies[len(latencies) // 2],
+                'latency_ms_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'latency_ms_max': latencies[-1],
+            }
+        return summary
+
+
+request_log = RequestLog()
+
+
+class TimedTemplate(Template):
+    """Adds the time spent rendering top-level templates, whole or streamed, to the current request"""
+
+    def render(self, *args, **kwargs):
+        if not has_request_context() or 'instrumentation' not in g:
+            return super().render(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            g.instrumentation['render_ms'] += (time.perf_counter() - start) * 1000
+
+    def generate(self, *args, **kwargs):
+        # Template.stream renders through generate, chunk by chunk while the body is sent
+        chunks = super().generate(*args, **kwargs)
+        if not has_request_context() or 'instrumentation' not in g:
+            return chunks
+        return _timed_chunks(chunks, g.instrumentation)
+
+
+def _timed_chunks(chunks, stats):
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            stats['render_ms'] += (time.perf_counter() - start) * 1000
+        yield chunk
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+    if not has_request_context() or 'instrumentation' not in g:
+        return
+    stats = g.instrumentation
+    stats['queries'] += 1
+    stats['sql_ms'] += elapsed_ms
+    if elapsed_ms > stats['slowest_ms']:
+        stats['slowest_ms'] = elapsed_ms
+        stats['slowest_statement'] = ' '.join(statement.split())
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, so its start time is dropped here,
+    # or it would stay in the info of the pooled connection for as long as the connection lives
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if exception_context.statement is not None and starts:
+        starts.pop()
+
+
+def _start_request():
+    g.instrumentation = {'start': time.perf_counter(), 'queries': 0, 'sql_ms': 0.0,
+                         'slowest_ms': 0.0, 'slowest_statement': None, 'render_ms': 0.0}
+
+
+def _finish_request(app, response):
+    stats = g.get('instrumentation')
+    if stats is None or request.endpoint == 'static':
+        return response
+
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint or '<unmatched>',
+        'status': response.status_code,
+    }
+    if response.is_streamed:
+        # The body is rendered, and runs its statements, while it is sent, so the record is completed
+        # once it is sent. Its headers are gone by then, so it sends none of the instrumentation headers.
+        response.response = _record_when_sent(app, response.response, stats, record)
+        return response
+
+    g.pop('instrumentation')
+    _complete_record(app, stats, record)
+    if app.config['INSTRUMENTATION_HEADERS']:
+        response.headers['X-Query-Count'] = str(record['queries'])
+        response.headers['Server-Timing'] = 'sql;dur=%.3f, render;dur=%.3f, total;dur=%.3f' % (
+            record['sql_ms'], record['render_ms'], record['total_ms'])
+    return response
+
+
+def _record_when_sent(app, body, stats, record):
+    try:
+        yield from body
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+        _complete_record(app, stats, record)
+
+
+def _complete_record(app, stats, record):
+    total_ms = (time.perf_counter() - stats['start']) * 1000
+    record.update({
+        'queries': stats['queries'],
+        'sql_ms': round(stats['sql_ms'], 3),
+        'slowest_ms': round(stats['slowest_ms'], 3),
+        'slowest_statement': stats['slowest_statement'],
+        'render_ms': round(stats['render_ms'], 3),
+        'total_ms': round(total_ms, 3),
+    })
+    record['flagged'] = (record['queries'] > app.config['SLOW_REQUEST_QUERIES'] or
+                         record['total_ms'] > app.config['SLOW_REQUEST_MS'])
+
+    request_log.append(record)
+    logger.log(logging.WARNING if record['flagged'] else logging.INFO, json.dumps(record))
+
+
+def init_instrumentation(app):
+    """
+        Hooks the instrumentation into the Flask request lifecycle, Jinja and the SQLAlchemy engines
+        ----
+        Args
+        ----
+            app (Flask): The Flask app
+    """
+    global request_log
+    request_log = RequestLog(app.config['INSTRUMENTATION_BUFFER_SIZE'])
+
+    if not logger.handlers:
+        # One JSON object per line, ready for a log shipper
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    app.jinja_env.template_class = TimedTemplate
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
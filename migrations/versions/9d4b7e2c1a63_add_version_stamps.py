@@ -0,0 +1,29 @@
+"""add the version_stamps table shared by the web workers and the command line
+
+Revision ID: 9d4b7e2c1a63
+Revises: c8e1f4a6d250
+Create Date: 2026-10-18 23:41:08.207519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b7e2c1a63'
+down_revision = 'c8e1f4a6d250'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'version_stamps',
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('version_stamps')
@@ -0,0 +1,48 @@
+"""add show join key, start_time and name search indexes
+
+Revision ID: a7c3e1f9b2d4
+Revises: 1355d4478a6d
+Create Date: 2026-10-18 09:12:40.512731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e1f9b2d4'
+down_revision = '1355d4478a6d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Detail pages filter shows by venue/artist and order them by start_time
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'])
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'])
+    # Keyset pagination sort keys of /shows, /venues and /artists
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+    op.create_index('ix_venues_state_city_id', 'venues', ['state', 'city', 'id'])
+    op.create_index('ix_artists_name_id', 'artists', ['name', 'id'])
+
+    # ILIKE '%term%' can only use a trigram index. SQLite has no pg_trgm, so
+    # test databases get a plain index under the same name instead.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_venues_name_trgm', 'venues', ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_artists_name_trgm', 'artists', ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    else:
+        op.create_index('ix_venues_name_trgm', 'venues', ['name'])
+        op.create_index('ix_artists_name_trgm', 'artists', ['name'])
+
+
+def downgrade():
+    op.drop_index('ix_artists_name_trgm', table_name='artists')
+    op.drop_index('ix_venues_name_trgm', table_name='venues')
+    op.drop_index('ix_artists_name_id', table_name='artists')
+    op.drop_index('ix_venues_state_city_id', table_name='venues')
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
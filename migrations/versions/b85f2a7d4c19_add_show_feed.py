@@ -0,0 +1,47 @@
+"""add the denormalized show_feed table read by the /shows page
+
+Revision ID: b85f2a7d4c19
+Revises: e41b6d2c8f05
+Create Date: 2026-10-18 14:22:51.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b85f2a7d4c19'
+down_revision = 'e41b6d2c8f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'show_feed',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('venue_name', sa.String(), nullable=True),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('artist_name', sa.String(), nullable=True),
+        sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+        sa.Column('start_time', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['id'], ['shows.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_show_feed_start_time_id', 'show_feed', ['start_time', 'id'])
+    op.create_index('ix_show_feed_venue_id_start_time_id', 'show_feed', ['venue_id', 'start_time', 'id'])
+    op.create_index('ix_show_feed_artist_id_start_time_id', 'show_feed', ['artist_id', 'start_time', 'id'])
+
+    # Backfill from the existing shows. Must match helper_functions.refresh_show_feed
+    op.execute(
+        'INSERT INTO show_feed (id, venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time) '
+        'SELECT shows.id, shows.venue_id, venues.name, shows.artist_id, artists.name, artists.image_link, shows.start_time '
+        'FROM shows JOIN venues ON venues.id = shows.venue_id JOIN artists ON artists.id = shows.artist_id')
+
+
+def downgrade():
+    op.drop_index('ix_show_feed_artist_id_start_time_id', table_name='show_feed')
+    op.drop_index('ix_show_feed_venue_id_start_time_id', table_name='show_feed')
+    op.drop_index('ix_show_feed_start_time_id', table_name='show_feed')
+    op.drop_table('show_feed')
@@ -0,0 +1,35 @@
+"""copy the venue city and state into show_feed for the calendar
+
+Revision ID: c8e1f4a6d250
+Revises: f5c8e2a9b317
+Create Date: 2026-10-18 21:07:33.514862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e1f4a6d250'
+down_revision = 'f5c8e2a9b317'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show_feed', sa.Column('venue_city', sa.String(length=120), nullable=True))
+    op.add_column('show_feed', sa.Column('venue_state', sa.String(length=120), nullable=True))
+    op.create_index('ix_show_feed_venue_city_start_time_id', 'show_feed', ['venue_city', 'start_time', 'id'])
+
+    # Backfill from the venues. Must match helper_functions.refresh_show_feed
+    op.execute(
+        'UPDATE show_feed SET '
+        'venue_city = (SELECT venues.city FROM venues WHERE venues.id = show_feed.venue_id), '
+        'venue_state = (SELECT venues.state FROM venues WHERE venues.id = show_feed.venue_id)')
+
+
+def downgrade():
+    op.drop_index('ix_show_feed_venue_city_start_time_id', table_name='show_feed')
+    with op.batch_alter_table('show_feed') as batch_op:
+        batch_op.drop_column('venue_state')
+        batch_op.drop_column('venue_city')
@@ -0,0 +1,80 @@
+"""add genres with venue_genres and artist_genres link tables, filled from the genres columns
+
+Revision ID: d3a9c6e1f472
+Revises: b85f2a7d4c19
+Create Date: 2026-10-18 16:05:12.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9c6e1f472'
+down_revision = 'b85f2a7d4c19'
+branch_labels = None
+depends_on = None
+
+
+def parse_genres(value):
+    # Same as helper_functions.parse_genres, copied so the migration does not depend on the app
+    genres = []
+    for genre in (value or '').strip().strip('{}').split(','):
+        genre = genre.strip().strip('"').strip()
+        if genre and genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def upgrade():
+    genres = op.create_table(
+        'genres',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    venue_genres = op.create_table(
+        'venue_genres',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    artist_genres = op.create_table(
+        'artist_genres',
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id_venue_id', 'venue_genres', ['genre_id', 'venue_id'])
+    op.create_index('ix_artist_genres_genre_id_artist_id', 'artist_genres', ['genre_id', 'artist_id'])
+
+    # Convert the stringified genre lists of the existing rows into links
+    bind = op.get_bind()
+    rows = {}
+    for table, key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        rows[key] = [(row.id, parse_genres(row.genres))
+                     for row in bind.execute(sa.text('SELECT id, genres FROM %s' % table))]
+    names = sorted({genre for entities in rows.values() for _, entity_genres in entities for genre in entity_genres})
+    if not names:
+        return
+    op.bulk_insert(genres, [{'name': name} for name in names])
+    genre_ids = dict((row.name, row.id) for row in bind.execute(sa.text('SELECT id, name FROM genres')))
+    for links, key in ((venue_genres, 'venue_id'), (artist_genres, 'artist_id')):
+        values = [{key: entity_id, 'genre_id': genre_ids[genre]}
+                  for entity_id, entity_genres in rows[key] for genre in entity_genres]
+        if values:
+            op.bulk_insert(links, values)
+
+
+def downgrade():
+    # The genres columns were kept up to date, so dropping the links loses nothing
+    op.drop_index('ix_artist_genres_genre_id_artist_id', table_name='artist_genres')
+    op.drop_index('ix_venue_genres_genre_id_venue_id', table_name='venue_genres')
+    op.drop_table('artist_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('genres')
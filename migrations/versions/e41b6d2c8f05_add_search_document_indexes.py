@@ -0,0 +1,40 @@
+"""add weighted full-text search indexes on venues and artists
+
+Revision ID: e41b6d2c8f05
+Revises: a7c3e1f9b2d4
+Create Date: 2026-10-18 11:03:27.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b6d2c8f05'
+down_revision = 'a7c3e1f9b2d4'
+branch_labels = None
+depends_on = None
+
+
+# Must stay identical to search.search_document, or the planner will not use the index
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(state, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(genres, '')), 'C')"
+)
+
+
+def upgrade():
+    # SQLite databases are searched with the in-process inverted index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE INDEX ix_venues_search ON venues USING gin ((%s))' % SEARCH_DOCUMENT)
+    op.execute('CREATE INDEX ix_artists_search ON artists USING gin ((%s))' % SEARCH_DOCUMENT)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_artists_search', table_name='artists')
+    op.drop_index('ix_venues_search', table_name='venues')
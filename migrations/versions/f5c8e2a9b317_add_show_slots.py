@@ -0,0 +1,63 @@
+"""turn show dates into start/end timestamps and forbid double bookings on Postgres
+
+Revision ID: f5c8e2a9b317
+Revises: d3a9c6e1f472
+Create Date: 2026-10-18 19:41:08.226419
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c8e2a9b317'
+down_revision = 'd3a9c6e1f472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+
+    for table in ('shows', 'show_feed'):
+        if postgresql:
+            op.alter_column(table, 'start_time', type_=sa.DateTime(), existing_type=sa.Date(),
+                            existing_nullable=False, postgresql_using='start_time::timestamp')
+        else:
+            # SQLite stores DATE and DATETIME columns alike (and a batch copy would CAST the
+            # strings to numbers), so only the 'YYYY-MM-DD' values are turned into timestamps
+            op.execute("UPDATE %s SET start_time = start_time || ' 00:00:00.000000' WHERE length(start_time) = 10"
+                       % table)
+
+    # The existing shows have no known length, so they get an empty slot that conflicts with nothing
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE shows SET end_time = start_time')
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_shows_slot', 'end_time >= start_time')
+
+    if postgresql:
+        # btree_gist lets a GiST index combine the integer equality with the range overlap
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_venue_slot '
+                   'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+        op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_artist_slot '
+                   'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        op.execute('ALTER TABLE shows DROP CONSTRAINT ex_shows_artist_slot')
+        op.execute('ALTER TABLE shows DROP CONSTRAINT ex_shows_venue_slot')
+
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_constraint('ck_shows_slot', type_='check')
+        batch_op.drop_column('end_time')
+
+    for table in ('shows', 'show_feed'):
+        if postgresql:
+            op.alter_column(table, 'start_time', type_=sa.Date(), existing_type=sa.DateTime(),
+                            existing_nullable=False, postgresql_using='start_time::date')
+        else:
+            op.execute('UPDATE %s SET start_time = substr(start_time, 1, 10)' % table)
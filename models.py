@@ -3,12 +3,48 @@ This module contains the database model for the Fyyur application.
     Venue model: This table contains information about the possible venues to host a musical show
     Artist model: This tables contains information about available artists that would love to hold a show
     Show model: This is a relationship table that holds information about which artist is utilizing a venue
+    ShowFeed model: A denormalized copy of shows with their venue and artist names, read by the /shows and /calendar pages
+    Genre model: The genres a venue or artist can be tagged with, linked through venue_genres and artist_genres.
+        The genres column of venues and artists keeps the display copy, e.g. {Jazz,"Rock n Roll"}.
+    VersionStamp model: The version stamps of caching.py, shared by every process using the database
 """
 
 from settings import db
 
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre ID: {self.id}, name: {self.name}>'
+
+
+# The primary keys serve lookups from a venue or artist, the genre_id indexes serve genre browsing
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city_id', 'state', 'city', 'id'),
+        # Trigram index for ILIKE '%term%' searches. On SQLite this is a plain index on name.
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -23,6 +59,7 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(500))
     artists = db.relationship('Show', back_populates='venues')
+    tagged_genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
 
 
     def __repr__(self):
@@ -30,6 +67,11 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_id', 'name', 'id'),
+        # Trigram index for ILIKE '%term%' searches. On SQLite this is a plain index on name.
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -43,21 +85,75 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(500))
     venues = db.relationship('Show', back_populates='artists')
+    tagged_genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
 
     def __repr__(self):
         return f'id: {self.id}, name: {self.name}, city: {self.city}, state: {self.state}, phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link}, website: {self.website}, seeking_venue: {self.seeking_venue}, seeking_description: {self.seeking_description}'
 
 
 class Show(db.Model):
+    """
+        A show occupies its venue and its artist from start_time to end_time (excluded).
+        On Postgres the exclusion constraints ex_shows_venue_slot and ex_shows_artist_slot, created by
+        the migrations, forbid overlapping shows at a venue or for an artist (see scheduling.py).
+    """
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint('end_time >= start_time', name='ck_shows_slot'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-    start_time = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
     artists = db.relationship('Artist', back_populates='venues')
     venues = db.relationship('Venue', back_populates='artists')
 
 
     def __repr__(self):
-        return f'<Artist ID: {self.id}, show_venue_id: {self.venue_id}, show_artist_id: {self.artist_id}, start_time: {self.start_time}>'
\ No newline at end of file
+        return f'<Artist ID: {self.id}, show_venue_id: {self.venue_id}, show_artist_id: {self.artist_id}, start_time: {self.start_time}, end_time: {self.end_time}>'
+
+class ShowFeed(db.Model):
+    """
+        Read-optimized copy of shows joined with their venue and artist, backing the /shows and /calendar pages.
+        Rows are kept in sync by the write handlers through helper_functions.refresh_show_feed and
+        update_show_feed, so listing shows needs no joins.
+    """
+    __tablename__ = 'show_feed'
+    __table_args__ = (
+        db.Index('ix_show_feed_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_feed_venue_id_start_time_id', 'venue_id', 'start_time', 'id'),
+        db.Index('ix_show_feed_artist_id_start_time_id', 'artist_id', 'start_time', 'id'),
+        db.Index('ix_show_feed_venue_city_start_time_id', 'venue_city', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, db.ForeignKey('shows.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String)
+    venue_city = db.Column(db.String(120))
+    venue_state = db.Column(db.String(120))
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    start_time = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ShowFeed ID: {self.id}, venue: {self.venue_name}, artist: {self.artist_name}, start_time: {self.start_time}>'
+
+
+class VersionStamp(db.Model):
+    """
+        The time of the last change of a collection or entity (see caching.py), e.g. 'venues' or 'venue:12'.
+        The web workers and the command line share them through this table.
+    """
+    __tablename__ = 'version_stamps'
+
+    name = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f'<VersionStamp name: {self.name}, version: {self.version}>'
@@ -0,0 +1,251 @@
+"""
+This module detects double bookings: two shows overlapping in time at the same venue, or with the
+same artist.
+    A show occupies the slot [start_time, end_time). On Postgres the exclusion constraints
+    ex_shows_venue_slot and ex_shows_artist_slot forbid overlaps, and find_conflict asks for an
+    overlapping show with the same && operator, so their GiST indexes answer it. Other databases
+    (SQLite in development) have no such index, so each process keeps a Schedule, one interval
+    tree per venue and per artist, rebuilt when the 'shows' version stamp changes (see caching.py).
+    Bulk schedules (bulk_import, the benchmark seed) check every new show against a Schedule too,
+    so n shows cost O(n log n) rather than one query each.
+    Shows created before end_time existed have an empty slot (end_time = start_time), and never
+    conflict with anything.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+import random
+import threading
+
+from flask import current_app
+from sqlalchemy import func, or_
+
+import caching
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'value', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, start, end, value, priority):
+        self.start, self.end, self.value, self.priority = start, end, value, priority
+        self.left = self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    node.max_end = node.end
+    for child in (node.left, node.right):
+        if child is not None and child.max_end > node.max_end:
+            node.max_end = child.max_end
+
+
+def _rotate_right(node):
+    left = node.left
+    node.left, left.right = left.right, node
+    _update(node)
+    _update(left)
+    return left
+
+
+def _rotate_left(node):
+    right = node.right
+    node.right, right.left = right.left, node
+    _update(node)
+    _update(right)
+    return right
+
+
+class IntervalTree:
+    """
+        Intervals [start, end) in a treap ordered by start, every node holding the largest end of
+        its subtree. Inserting an interval and finding one that overlaps a slot take O(log n) on
+        average. Empty intervals (start >= end) overlap nothing and are not stored.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+        self._random = random.Random(0)
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, start, end, value):
+        if not start < end:
+            return
+        self.root = self._insert(self.root, _Node(start, end, value, self._random.random()))
+        self.size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.start < node.start:
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                return _rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                return _rotate_left(node)
+        _update(node)
+        return node
+
+    def overlap(self, start, end):
+        """Returns the value of an interval overlapping [start, end), or None if there is none"""
+        if not start < end:
+            return None
+        node = self.root
+        while node is not None:
+            if node.start < end and start < node.end:
+                return node.value
+            # When the left subtree reaches past start but holds no overlap, its latest ending
+            # interval starts at or after end, and so does every interval on the right
+            if node.left is not None and node.left.max_end > start:
+                node = node.left
+            else:
+                node = node.right
+        return None
+
+
+class Schedule:
+    """The booked slots of every venue and artist, each in an IntervalTree"""
+
+    def __init__(self, rows=(), version=None):
+        self.version = version
+        self.venues = defaultdict(IntervalTree)
+        self.artists = defaultdict(IntervalTree)
+        self._lock = threading.Lock()
+        for show_id, venue_id, artist_id, start_time, end_time in rows:
+            self.add(show_id, venue_id, artist_id, start_time, end_time)
+
+    def add(self, value, venue_id, artist_id, start_time, end_time):
+        with self._lock:
+            self.venues[venue_id].insert(start_time, end_time, value)
+            self.artists[artist_id].insert(start_time, end_time, value)
+
+    def conflict(self, venue_id, artist_id, start_time, end_time):
+        """
+            Finds a show overlapping a slot at the same venue or with the same artist
+            ----
+            Args
+            ----
+                venue_id, artist_id (int): The venue and artist of the new show
+                start_time, end_time (datetime): The slot of the new show
+            -------
+            Returns
+            -------
+                conflict (tuple): ('venue_id' or 'artist_id', the value added with the conflicting show), or None
+        """
+        with self._lock:
+            for field, trees, key in (('venue_id', self.venues, venue_id), ('artist_id', self.artists, artist_id)):
+                tree = trees.get(key)
+                value = tree.overlap(start_time, end_time) if tree is not None else None
+                if value is not None:
+                    return field, value
+        return None
+
+
+def slot(start_time, end_time=None):
+    """The slot of a show. Without an end time it lasts SHOW_DEFAULT_DURATION_MINUTES."""
+    if end_time is None:
+        end_time = start_time + timedelta(minutes=current_app.config['SHOW_DEFAULT_DURATION_MINUTES'])
+    return start_time, end_time
+
+
+def load_schedule(db, app_model, version=None):
+    """Builds the Schedule of every show in the database"""
+    Show = app_model.Show
+    return Schedule(db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time),
+                    version)
+
+
+_schedule = None
+_build_lock = threading.Lock()
+
+
+STAMPS = ['all', 'shows']
+
+
+def _versions(cache):
+    return cache.versions(STAMPS)
+
+
+def get_schedule(db, cache, app_model):
+    """
+        Returns this process's Schedule of the shows, building it when it is missing or out of date
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            cache (NullCache): The cache backend holding the version stamps
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+        -------
+        Returns
+        -------
+            schedule (Schedule): The booked slots
+    """
+    global _schedule
+    version = _versions(cache)
+    if _schedule is None or _schedule.version != version:
+        with _build_lock:
+            if _schedule is None or _schedule.version != version:
+                _schedule = load_schedule(db, app_model, version)
+    return _schedule
+
+
+def show_added(show, bumped):
+    """A show was created. bumped is what caching.show_created returned."""
+    global _schedule
+    schedule = _schedule
+    if schedule is None:
+        return
+    version = caching.after_bump(schedule.version, STAMPS, bumped)
+    if version is None:
+        # Another process added a show since the schedule was loaded, so it misses that show
+        _schedule = None
+        return
+    schedule.add(show.id, show.venue_id, show.artist_id, show.start_time, show.end_time)
+    schedule.version = version
+
+
+def find_conflict(db, cache, app_model, venue_id, artist_id, start_time, end_time):
+    """
+        Finds a show that a new show would double-book
+        ----
+        Args
+        ----
+            db (SQLAlchemy): The ORM postgres object
+            cache (NullCache): The cache backend holding the version stamps
+            app_model (flask_alchemy_model): The app_model object references the tables in the database.
+            venue_id, artist_id (int): The venue and artist of the new show
+            start_time, end_time (datetime): The slot of the new show
+        -------
+        Returns
+        -------
+            conflict (tuple): ('venue_id' or 'artist_id', the conflicting Show), or None
+    """
+    Show = app_model.Show
+    if db.engine.dialect.name == 'postgresql':
+        show = db.session.query(Show).filter(
+            or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+            func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start_time, end_time))).first()
+        if show is None:
+            return None
+        return ('venue_id' if show.venue_id == venue_id else 'artist_id'), show
+
+    conflict = get_schedule(db, cache, app_model).conflict(venue_id, artist_id, start_time, end_time)
+    if conflict is None:
+        return None
+    field, show_id = conflict
+    return field, db.session.get(Show, show_id)
+
+
+def describe_conflict(field, show):
+    """The message telling which show a new show would double-book"""
+    slot_text = '%s to %s' % (show.start_time.strftime('%Y-%m-%d %H:%M'), show.end_time.strftime('%Y-%m-%d %H:%M'))
+    # The other side of the show may be gone: deleting a venue or an artist leaves its shows with a NULL id
+    if field == 'venue_id':
+        by = ', by %s' % show.artists.name if show.artists is not None else ''
+        return 'The venue is already booked from %s%s (show #%d).' % (slot_text, by, show.id)
+    at = ', at %s' % show.venues.name if show.venues is not None else ''
+    return 'The artist is already playing from %s%s (show #%d).' % (slot_text, at, show.id)
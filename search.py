@@ -0,0 +1,242 @@
+"""
+This module contains the search engine behind /venues/search and /artists/search.
+    Venues and artists are searched on name, city, state and genres. Results are ranked by
+    relevance, accept prefixes ("jaz" finds "Jazz") and tolerate one typo per word.
+    PostgresSearchBackend: answers from a weighted tsvector index and the pg_trgm index on name
+    InvertedIndexBackend: an in-process inverted index used when the database is SQLite. It
+        remembers the version stamps of its model (see caching.py), which every process shares,
+        and is rebuilt when another worker or an import changes the model.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+import re
+
+from sqlalchemy import func, literal_column, or_
+
+
+# Fields that are searched, with the weight of a match in each of them
+SEARCH_FIELDS = (('name', 'A'), ('city', 'B'), ('state', 'B'), ('genres', 'C'))
+FIELD_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+
+_token_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Splits a text into lowercase word tokens"""
+    if not text:
+        return []
+    return _token_pattern.findall(text.lower())
+
+
+def search_document(model):
+    """
+        Builds the weighted tsvector a venue or artist is searched on.
+        It must stay identical to the expression of the ix_<table>_search GIN index.
+        ----
+        Args
+        ----
+            model (db.Model): The Venue or Artist model
+        -------
+        Returns
+        -------
+            document (ColumnElement): The tsvector expression
+    """
+    simple = literal_column("'simple'::regconfig")
+    empty = literal_column("''")
+    document = None
+    for field, weight in SEARCH_FIELDS:
+        vector = func.setweight(
+            func.to_tsvector(simple, func.coalesce(getattr(model, field), empty)),
+            literal_column("'%s'" % weight))
+        document = vector if document is None else document.op('||')(vector)
+    return document
+
+
+class PostgresSearchBackend:
+    """Ranks matches with ts_rank on the weighted document plus trigram similarity on the name"""
+
+    def search(self, db, model, search_term, limit, cache=None):
+        """
+            Searches a model and counts every match in one query
+            ----
+            Args
+            ----
+                db (SQLAlchemy): The ORM postgres object
+                model (db.Model): The Venue or Artist model
+                search_term (string): The search keyword(s)
+                limit (int): The maximum number of results returned
+                cache (NullCache): The cache backend holding the version stamps, unused here
+            -------
+            Returns
+            -------
+                search_result (dict): count of all matches and data, the best ranked matches
+        """
+        tokens = tokenize(search_term)
+        if not tokens:
+            return {'count': 0, 'data': []}
+
+        document = search_document(model)
+        # Every word must match, and each may be the prefix of a longer word
+        ts_query = func.to_tsquery(literal_column("'simple'::regconfig"),
+                                   ' & '.join(token + ':*' for token in tokens))
+        term = ' '.join(tokens)
+        rank = func.ts_rank(document, ts_query) + func.similarity(model.name, term)
+
+        # name % term is the pg_trgm similarity operator. It catches typos in the name
+        # and, unlike similarity() > x, can use the trigram index.
+        rows = db.session.query(
+            model.id, model.name, func.count().over().label('total')).filter(
+            or_(document.op('@@')(ts_query), model.name % term)).order_by(
+            rank.desc(), model.name, model.id).limit(limit).all()
+
+        return {
+            'count': rows[0].total if rows else 0,
+            'data': [{'id': row.id, 'name': row.name} for row in rows]
+        }
+
+
+class InvertedIndexBackend:
+    """
+        Keeps one inverted index per model in memory. An index is built from the database
+        on the first search and rebuilt on the next search after mark_stale is called, or
+        once the 'all' or model stamp of the cache differs from the one it was built at.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+
+    def mark_stale(self, model=None):
+        """Drops the index of a model (or of every model) so it is rebuilt on the next search"""
+        if model is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(model.__tablename__, None)
+
+    def _index(self, db, model, cache=None):
+        version = cache.versions(['all', model.__tablename__]) if cache is not None else None
+        index = self._indexes.get(model.__tablename__)
+        if index is None or (version is not None and index.version != version):
+            index = _InvertedIndex(db.session.query(
+                model.id, model.name, *[getattr(model, field) for field, _ in SEARCH_FIELDS[1:]]), version)
+            self._indexes[model.__tablename__] = index
+        return index
+
+    def search(self, db, model, search_term, limit, cache=None):
+        """Same as PostgresSearchBackend.search. Without a cache the index is never checked for changes."""
+        tokens = tokenize(search_term)
+        if not tokens:
+            return {'count': 0, 'data': []}
+        return self._index(db, model, cache).search(tokens, limit)
+
+
+class _InvertedIndex:
+    """
+        Maps tokens to the documents containing them.
+        Prefixes are found by bisecting the sorted vocabulary and typos with a
+        single-deletion neighbourhood (the "symmetric delete" technique), so a lookup
+        never walks the whole vocabulary.
+    """
+
+    # Words shorter than this are matched exactly or by prefix only
+    MIN_TYPO_LENGTH = 4
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.names = {}
+        self.postings = defaultdict(dict)  # token -> {document id: weight}
+        for row in rows:
+            self.names[row[0]] = row[1]
+            for value, (_, weight) in zip(row[1:], SEARCH_FIELDS):
+                for token in tokenize(value):
+                    postings = self.postings[token]
+                    postings[row[0]] = max(postings.get(row[0], 0), FIELD_WEIGHTS[weight])
+
+        self.vocabulary = sorted(self.postings)
+        self.deletes = defaultdict(set)
+        for token in self.vocabulary:
+            if len(token) >= self.MIN_TYPO_LENGTH:
+                for variant in _deletes(token):
+                    self.deletes[variant].add(token)
+
+    def _matches(self, word):
+        """Returns {token: score factor} for the tokens that a query word matches"""
+        matches = {}
+        if word in self.postings:
+            matches[word] = 1.0
+
+        i = bisect_left(self.vocabulary, word)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            matches.setdefault(self.vocabulary[i], 0.7)
+            i += 1
+
+        if len(word) >= self.MIN_TYPO_LENGTH:
+            candidates = set(self.deletes.get(word, ()))  # one character missing from the query
+            for variant in _deletes(word):
+                candidates.update(self.deletes.get(variant, ()))  # substituted or transposed character
+                if variant in self.postings:
+                    candidates.add(variant)  # one extra character in the query
+            for token in candidates:
+                if _within_one_edit(word, token):
+                    matches.setdefault(token, 0.4)
+        return matches
+
+    def search(self, tokens, limit):
+        scores = None
+        for word in tokens:
+            word_scores = defaultdict(float)
+            for token, factor in self._matches(word).items():
+                for document_id, weight in self.postings[token].items():
+                    word_scores[document_id] = max(word_scores[document_id], factor * weight)
+
+            # Every word must match
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {document_id: score + word_scores[document_id]
+                          for document_id, score in scores.items() if document_id in word_scores}
+            if not scores:
+                return {'count': 0, 'data': []}
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.names[item[0]] or '', item[0]))
+        return {
+            'count': len(ranked),
+            'data': [{'id': document_id, 'name': self.names[document_id]} for document_id, _ in ranked[:limit]]
+        }
+
+
+def _deletes(word):
+    """All the strings obtained by deleting one character of word"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    """Tells whether a and b differ by at most one insertion, deletion, substitution or transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+
+postgres_backend = PostgresSearchBackend()
+inverted_index_backend = InvertedIndexBackend()
+
+
+def get_backend(db):
+    """Returns the search backend that fits the database behind db"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgres_backend
+    return inverted_index_backend
+
+
+def mark_stale(model=None):
+    """Tells the in-process backend that venues or artists changed. Postgres indexes update themselves."""
+    inverted_index_backend.mark_stale(model)
@@ -1,13 +1,99 @@
+"""
+This module holds the Flask extensions of the app and create_app, the application factory.
+    The extensions are created unbound, so the models and the views can import them before any app
+    exists. create_app builds an app from a config object, binds the extensions and registers the
+    views blueprint. Modules that are only needed by the command line (migrations, imports,
+    exports, EXPLAIN, asset builds) are imported when cli=True, so web workers start without them.
+"""
+
+import logging
+from logging import FileHandler, Formatter
+import os
+
 from flask import Flask
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 
+from caching import Cache
+from database import RoutingSQLAlchemy, configure_database
+
+
+moment = Moment()
+db = RoutingSQLAlchemy()
+cache = Cache()
+
+
+def _secret_key(app):
+    # Every worker must sign sessions and CSRF tokens with the same key, so it comes from the
+    # environment. A random key per process is only acceptable on a single debug process.
+    if app.config['SECRET_KEY']:
+        return
+    if not app.debug:
+        raise RuntimeError('SECRET_KEY is not set')
+    app.logger.warning('SECRET_KEY is not set, using a random key for this process')
+    app.config['SECRET_KEY'] = os.urandom(32)
+
+
+def _register_cli(app):
+    from flask_migrate import Migrate
+
+    import assets
+    import bulk_import
+    import explain
+    import export
+
+    Migrate(app, db)
+    app.cli.add_command(explain.explain_hot_queries_command)
+    app.cli.add_command(bulk_import.import_data_command)
+    app.cli.add_command(export.export_data_command)
+    app.cli.add_command(assets.build_assets_command)
+
+
+def _log_errors(app):
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
+
+
+def create_app(config_object='config', cli=True):
+    """
+        Builds the Fyyur app
+        ----
+        Args
+        ----
+            config_object (string or object): The configuration, as accepted by Config.from_object
+            cli (bool): Also set up the command line (flask db, import-data, export-data, explain-hot-queries,
+                build-assets)
+        -------
+        Returns
+        -------
+            app (Flask): The app
+    """
+    from assets import init_assets
+    from compression import init_compression
+    from fragments import init_fragment_cache
+    from instrumentation import init_instrumentation
+    from views import bp
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    _secret_key(app)
 
+    moment.init_app(app)
+    configure_database(app)
+    db.init_app(app)
+    cache.init_app(app)
+    init_fragment_cache(app)
+    init_instrumentation(app)
+    init_assets(app)
+    init_compression(app)
+    app.register_blueprint(bp)
 
+    if cli:
+        _register_cli(app)
+    if not app.debug:
+        _log_errors(app)
+    return app
@@ -0,0 +1,129 @@
+"""
+Fixtures of the regression tests: the app on a seeded scratch database, form data of new rows, and SQL
+statement counts.
+    The database is TEST_DATABASE_URL, a SQLite file in a temporary directory by default. It is
+    DROPPED and seeded with benchmarks.seed, so never point it at real data. Point it at a scratch
+    Postgres database to run the query plan tests too:
+
+        TEST_DATABASE_URL=postgresql://localhost/fyyur_test python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The configuration is read when the app is created, so set it up first. The read-through cache
+# is off, so every request reaches the database and the counts do not depend on the test order.
+os.environ['DATABASE_URL'] = os.environ.get(
+    'TEST_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='fyyur-tests-'), 'test.db'))
+os.environ['CACHE_BACKEND'] = 'null'
+os.environ.setdefault('SECRET_KEY', 'tests')
+
+# Enough shows per venue and artist that a query per row stands out from a query per page
+VENUES, ARTISTS, SHOWS = 40, 80, 2000
+
+
+@pytest.fixture(scope='session')
+def app():
+    from benchmarks.seed import seed
+    import models as app_model
+    from settings import create_app, db
+
+    app = create_app()
+    # The form templates do not render CSRF tokens
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        seed(db, app_model, VENUES, ARTISTS, SHOWS)
+    return app
+
+
+@pytest.fixture(scope='session')
+def engine(app):
+    from settings import db
+
+    with app.app_context():
+        return db.engine
+
+
+@pytest.fixture(scope='session')
+def sample(app):
+    """The busiest venue and artist (the worst case detail pages) and a day with shows"""
+    import models as app_model
+    from settings import db
+
+    Show = app_model.Show
+    with app.app_context():
+        venue_id = db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(
+            db.func.count().desc(), Show.venue_id).limit(1).scalar()
+        artist_id = db.session.query(Show.artist_id).group_by(Show.artist_id).order_by(
+            db.func.count().desc(), Show.artist_id).limit(1).scalar()
+        day = db.session.query(db.func.min(Show.start_time)).filter(Show.venue_id == venue_id).scalar().date()
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'date': day.isoformat()}
+
+
+@pytest.fixture
+def venue_form():
+    """The form data of a new venue. Tests change the name so their rows stay apart."""
+    return {
+        'name': 'The Budget Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '512-555-0100',
+        'genres': ['Jazz', 'Blues'], 'facebook_link': '', 'image_link': '', 'website_link': '',
+        'seeking_talent': 'y', 'seeking_description': '',
+    }
+
+
+@pytest.fixture
+def artist_form(venue_form):
+    """The form data of a new artist"""
+    return dict(venue_form, name='The Budget Band', seeking_venue='y')
+
+
+@pytest.fixture
+def last_id(app):
+    """Returns a function returning the highest id of a model (by class name), e.g. of the row just created"""
+    import models as app_model
+    from settings import db
+
+    def last_id(model_name):
+        with app.app_context():
+            model = getattr(app_model, model_name)
+            return db.session.query(db.func.max(model.id)).scalar()
+
+    return last_id
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(client, engine):
+    """
+        Returns a function sending a request and returning the number of SQL statements it ran
+        ----
+        Args
+        ----
+            method (string): The HTTP method
+            url (string): The URL
+            data (dict): The form data of a POST
+            status (int): The expected response status
+            expect (bytes): Text the response body must contain, e.g. the flashed outcome of a write
+    """
+    from explain import capture_statements
+
+    def count(method, url, data=None, status=200, expect=None):
+        with capture_statements(engine) as statements:
+            response = client.open(url, method=method, data=data)
+            # Streamed pages run their queries while the body is read
+            body = response.get_data()
+        assert response.status_code == status, (method, url, response.status_code)
+        assert expect is None or expect in body, (method, url, expect)
+        return len(statements)
+
+    return count
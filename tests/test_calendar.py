@@ -0,0 +1,23 @@
+"""
+Dates of the calendar pages (see helper_functions.calendar_range).
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    '/calendar/day?date=0001-01-01',
+    '/calendar/week?date=0001-01-01',
+    '/calendar?date=0001-01-01',
+    '/calendar?date=9999-12-15',
+    '/calendar/day?date=9999-12-31',
+    '/api/calendar/week?date=9999-12-31',
+    '/api/calendar/month?date=2026-02-30',
+])
+def test_dates_out_of_range_are_bad_requests(client, url):
+    assert client.get(url).status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/calendar/day?date=0001-01-02', '/api/calendar/month?date=9999-11-15'])
+def test_dates_next_to_the_limits_are_served(client, url):
+    assert client.get(url).status_code == 200
@@ -0,0 +1,25 @@
+"""
+Conditional GETs of compressed pages (see conditional.py and compression.py).
+"""
+
+
+def _etag(response):
+    return response.headers['ETag'].strip('"')
+
+
+def test_a_compressed_etag_only_matches_requests_accepting_its_encoding(client):
+    gzipped = _etag(client.get('/venues', headers={'Accept-Encoding': 'gzip'}))
+    assert gzipped.endswith('-gzip')
+    tag = gzipped[:-len('-gzip')]
+
+    def status(etag, accept_encoding):
+        headers = {'If-None-Match': '"%s"' % etag, 'Accept-Encoding': accept_encoding}
+        return client.get('/venues', headers=headers).status_code
+
+    assert status(gzipped, 'gzip') == 304
+    # The client would keep a body it cannot decode
+    assert status(gzipped, 'identity') == 200
+    assert status(tag + '-br', 'gzip') == 200
+    # A page shorter than COMPRESSION_MIN_SIZE is sent as is, whatever the client accepts
+    assert status(tag, 'identity') == 304
+    assert status(tag, 'gzip') == 304
@@ -0,0 +1,17 @@
+"""
+The venue and artist detail pages (see helper_functions.get_venue_OR_artist_detail).
+"""
+
+
+def test_the_show_counts_leave_out_the_shows_the_lists_leave_out(client, venue_form, artist_form, last_id):
+    client.post('/venues/create', data=dict(venue_form, name='The Closing Hall'))
+    venue_id = last_id('Venue')
+    client.post('/artists/create', data=dict(artist_form, name='The Counted Band'))
+    artist_id = last_id('Artist')
+    client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2036-01-01 20:00'})
+    assert b'1 Upcoming Show<' in client.get('/artists/%d' % artist_id).data
+
+    # The show of a deleted venue is not listed, so it is not counted either
+    client.get('/venues/%d/delete' % venue_id)
+    page = client.get('/artists/%d' % artist_id).data
+    assert b'0 Upcoming Shows' in page and b'The Closing Hall' not in page
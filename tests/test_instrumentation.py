@@ -0,0 +1,31 @@
+"""
+Per-request SQL instrumentation (see instrumentation.py).
+"""
+
+import pytest
+from sqlalchemy import exc, text
+
+
+def test_a_failed_statement_leaves_no_start_time_on_the_connection(engine):
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(exc.DBAPIError):
+                connection.execute(text('SELECT * FROM no_such_table'))
+        connection.execute(text('SELECT 1'))
+        assert connection.info.get('query_start') == []
+
+
+def test_a_streamed_page_is_recorded_once_its_body_is_sent(client):
+    import instrumentation
+
+    response = client.get('/venues')
+    assert not response.is_sequence
+    sent = len(instrumentation.request_log.records())
+    response.get_data()
+    response.close()
+
+    records = instrumentation.request_log.records()
+    assert len(records) == sent + 1
+    assert records[-1]['endpoint'] == 'main.venues'
+    assert records[-1]['render_ms'] > 0 and records[-1]['queries'] > 0
+    assert records[-1]['total_ms'] >= records[-1]['render_ms'] + records[-1]['sql_ms']
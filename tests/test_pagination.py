@@ -0,0 +1,61 @@
+"""
+Keyset pagination (see helper_functions.paginate_keyset): pages cover every row once, and cursors
+that were not made by encode_cursor are bad requests.
+"""
+
+from base64 import urlsafe_b64encode
+import json
+
+import pytest
+
+
+def cursor(values):
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_pages_cover_every_row_once(app):
+    import helper_functions as controller_funcs
+    import models as app_model
+    from settings import db
+
+    with app.app_context():
+        expected = [row.id for row in db.session.query(app_model.Artist.id).order_by(
+            app_model.Artist.name, app_model.Artist.id)]
+        pages, after = [], None
+        while True:
+            page = controller_funcs.get_artist(db, app_model, 7, after=after)
+            pages.append(page)
+            if not page.next_cursor:
+                break
+            after = page.next_cursor
+        assert [artist['id'] for page in pages for artist in page.items] == expected
+
+        # Going back from the second page gives the first page again
+        previous = controller_funcs.get_artist(db, app_model, 7, before=pages[1].prev_cursor)
+        assert previous.items == pages[0].items
+
+
+def test_calendar_api_pages_follow_the_next_links(client, sample):
+    url = '/api/calendar/month?date=%s&venue_id=%d&per_page=2' % (sample['date'], sample['venue_id'])
+    ids = []
+    while url:
+        body = client.get(url).get_json()
+        ids.extend(show['id'] for show in body['shows'])
+        url = body['next']
+    assert ids and len(ids) == len(set(ids))
+
+
+@pytest.mark.parametrize('url', [
+    '/shows?after=%s' % cursor([5, 1]),
+    '/shows?after=%s' % cursor(['2026-01-01T20:00:00', True]),
+    '/shows?before=%s' % cursor(['not a time', 1]),
+    '/artists?after=%s' % cursor([{'a': 1}, 1]),
+    '/artists?after=%s' % cursor(['Band', '1']),
+    '/venues?after=%s' % cursor([[1], 'x']),
+    '/venues?after=%s' % cursor(['CA']),
+    '/venues?after=not-base64!',
+    '/genres/Jazz/venues?after=%s' % cursor([1.5]),
+    '/calendar?after=%s' % cursor([None, {'id': 1}]),
+])
+def test_malformed_cursors_are_bad_requests(client, url):
+    assert client.get(url).status_code == 400
@@ -0,0 +1,136 @@
+"""
+Upper bounds on the number of SQL statements of every route, on the seeded database.
+    A helper that loops over rows and lazy-loads relationships (Venue.artists, Show.venues, ...)
+    runs one statement per row, so it blows these budgets instead of slipping through. The
+    budgets are the current counts: raise one only with the reason in the commit.
+    Pages are requested once before they are counted, so the per-process indexes (search,
+    autocomplete, the show schedule) are loaded already, as they are on a busy worker. The
+    conditional pages read the version stamps first (one statement), the autocomplete only every
+    AUTOCOMPLETE_STAMP_INTERVAL seconds, and every write bumps them (three statements, see
+    caching.DatabaseStamps).
+"""
+
+import pytest
+
+
+# (URL, statement budget) of the pages. {venue_id}, {artist_id} and {date} come from `sample`.
+READ_BUDGETS = [
+    ('/', 0),
+    ('/venues', 3),
+    ('/venues?state=CA&city=San+Francisco', 3),
+    ('/venues/{venue_id}', 4),
+    ('/venues/{venue_id}/edit', 2),
+    ('/venues/create', 0),
+    ('/venues/autocomplete?q=blu', 0),
+    ('/artists', 2),
+    ('/artists/{artist_id}', 4),
+    ('/artists/{artist_id}/edit', 2),
+    ('/artists/create', 0),
+    ('/artists/autocomplete?q=blu', 0),
+    ('/shows', 2),
+    ('/shows?venue_id={venue_id}&when=upcoming', 2),
+    ('/shows/create', 0),
+    ('/calendar', 3),
+    ('/calendar/week?date={date}', 3),
+    ('/calendar/day?date={date}&city=Austin', 3),
+    ('/api/calendar/month?date={date}&venue_id={venue_id}', 3),
+    ('/genres', 2),
+    ('/genres/Jazz/venues', 3),
+    ('/genres/Jazz/artists?state=CA', 3),
+    ('/export/shows.csv', 1),
+    ('/export/venues.ndjson', 1),
+    ('/export/artists.csv?gzip=1', 1),
+    ('/cache/stats', 0),
+    ('/db/pool', 0),
+    ('/instrumentation/requests', 0),
+]
+
+SEARCH_BUDGETS = [
+    ('/venues/search', {'search_term': 'blue hall'}, 4),
+    ('/artists/search', {'search_term': 'band'}, 3),
+]
+
+# Endpoints covered by the write tests below
+WRITE_ENDPOINTS = {
+    'main.create_venue_submission', 'main.edit_venue_submission', 'main.delete_venue',
+    'main.create_artist_submission', 'main.edit_artist_submission', 'main.delete_artist',
+    'main.create_show_submission', 'main.search_venues', 'main.search_artists',
+}
+
+
+def test_every_route_has_a_budget(app):
+    urls = app.url_map.bind('localhost')
+    covered = set(WRITE_ENDPOINTS)
+    for url, _ in READ_BUDGETS:
+        path = url.split('?')[0].format(venue_id=1, artist_id=1, date='2026-01-01')
+        covered.add(urls.match(path)[0])
+    routes = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint not in ('static', 'assets')}
+    assert routes - covered == set(), 'routes without a query budget'
+
+
+@pytest.mark.parametrize('url, budget', READ_BUDGETS, ids=[url for url, _ in READ_BUDGETS])
+def test_page_query_budget(count_queries, sample, url, budget):
+    url = url.format(**sample)
+    count_queries('GET', url)
+    assert count_queries('GET', url) <= budget
+
+
+@pytest.mark.parametrize('url, data, budget', SEARCH_BUDGETS, ids=[url for url, _, _ in SEARCH_BUDGETS])
+def test_search_query_budget(count_queries, url, data, budget):
+    assert count_queries('POST', url, data) <= budget
+
+
+def test_missing_venue_query_budget(count_queries):
+    assert count_queries('GET', '/venues/999999', status=404) <= 2
+
+
+def _name(app, model_name, entity_id):
+    """The name of a venue or artist, None once it is deleted"""
+    import models as app_model
+    from settings import db
+
+    with app.app_context():
+        model = getattr(app_model, model_name)
+        return db.session.query(model.name).filter(model.id == entity_id).scalar()
+
+
+# The budgets of the writes only hold when the write happened: a failed write sends fewer
+# statements, so every write also checks its outcome.
+
+def test_venue_write_query_budgets(app, count_queries, sample, venue_form, last_id):
+    assert count_queries('POST', '/venues/create', venue_form, expect=b'was successfully listed!') <= 7
+    venue_id = last_id('Venue')
+    assert _name(app, 'Venue', venue_id) == venue_form['name']
+    # Renaming the busiest venue rewrites its show feed rows in one UPDATE
+    assert count_queries('POST', '/venues/%d/edit' % sample['venue_id'], dict(venue_form, name='Renamed Hall'),
+                         status=302) <= 13
+    assert _name(app, 'Venue', sample['venue_id']) == 'Renamed Hall'
+    assert count_queries('GET', '/venues/%d/delete' % venue_id, expect=b'Successfully deleted Venue') <= 10
+    assert _name(app, 'Venue', venue_id) is None
+
+
+def test_artist_write_query_budgets(app, count_queries, sample, artist_form, last_id):
+    assert count_queries('POST', '/artists/create', artist_form, expect=b'was successfully listed!') <= 7
+    artist_id = last_id('Artist')
+    assert _name(app, 'Artist', artist_id) == artist_form['name']
+    assert count_queries('POST', '/artists/%d/edit' % sample['artist_id'], dict(artist_form, name='Renamed Band'),
+                         status=302) <= 13
+    assert _name(app, 'Artist', sample['artist_id']) == 'Renamed Band'
+    assert count_queries('GET', '/artists/%d/delete' % artist_id, expect=b'Successfully deleted Artist') <= 10
+    assert _name(app, 'Artist', artist_id) is None
+
+
+def test_show_write_query_budgets(count_queries, venue_form, artist_form, last_id):
+    count_queries('POST', '/venues/create', dict(venue_form, name='The Show Budget Hall'), expect=b'successfully')
+    count_queries('POST', '/artists/create', dict(artist_form, name='The Show Budget Band'), expect=b'successfully')
+    show = {'venue_id': last_id('Venue'), 'artist_id': last_id('Artist')}
+    created = b'Show was successfully created'
+    shows = last_id('Show')
+    # The first show of the process also loads the schedule
+    assert count_queries('POST', '/shows/create', dict(show, start_time='2031-01-01 20:00'), expect=created) <= 9
+    assert count_queries('POST', '/shows/create', dict(show, start_time='2031-01-02 20:00'), expect=created) <= 8
+    assert last_id('Show') == shows + 2
+    # A double booking names the conflicting show, and adds nothing
+    assert count_queries('POST', '/shows/create', dict(show, start_time='2031-01-02 21:00'),
+                         expect=b'The venue is already booked from 2031-01-02 20:00') <= 3
+    assert last_id('Show') == shows + 2
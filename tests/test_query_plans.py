@@ -0,0 +1,77 @@
+"""
+Query plan regression tests of the hot queries (explain.hot_queries). They need Postgres
+(TEST_DATABASE_URL), and are skipped on SQLite.
+    The seeded tables are small enough for the planner to scan them whatever the indexes, so the
+    plans are made with sequential scans discouraged, like `flask explain-hot-queries --no-seqscan`.
+    A sequential scan of shows (or of its show_feed copy) that remains means that no index can
+    serve the query, and fails the test.
+    The plans are kept as snapshots in tests/plans/, without costs and literal values. A plan
+    that no longer matches its snapshot fails too: review it, and run the tests again with
+    UPDATE_PLAN_SNAPSHOTS=1 to accept it. Missing snapshots are written.
+"""
+
+import difflib
+import os
+import re
+
+import pytest
+
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plans')
+
+SHOWS_TABLES = ('shows', 'show_feed')
+
+
+@pytest.fixture(scope='session')
+def plans(app, engine):
+    """The EXPLAIN plans of the hot queries, as (query name, statement, plan lines) tuples"""
+    import explain
+    import models as app_model
+    from settings import db
+
+    if engine.dialect.name != 'postgresql':
+        pytest.skip('query plans are checked on Postgres only, set TEST_DATABASE_URL')
+    with app.app_context():
+        return explain.explain_hot_queries(db, app_model, no_seqscan=True)
+
+
+def normalize(line):
+    """A plan line without its costs, row estimates and literal values, which vary between runs"""
+    line = re.sub(r'\s+\(cost=[^)]*\)', '', line)
+    line = re.sub(r"'[^']*'(::[\w ]+)?", "'?'", line)
+    return re.sub(r'\b\d+(\.\d+)?\b', 'N', line.rstrip())
+
+
+def snapshot(statements):
+    return ''.join('%s\n%s\n\n' % (' '.join(statement.split()), '\n'.join(normalize(line) for line in plan))
+                   for statement, plan in statements)
+
+
+def test_no_sequential_scan_of_shows(plans):
+    import explain
+
+    scans = ['%s: %s' % (name, line.strip()) for name, _, plan in plans for line in plan
+             if any(explain.is_sequential_scan(line, table) for table in SHOWS_TABLES)]
+    assert scans == []
+
+
+def test_plans_match_snapshots(plans):
+    by_name = {}
+    for name, statement, plan in plans:
+        by_name.setdefault(name, []).append((statement, plan))
+
+    changed = []
+    for name, statements in by_name.items():
+        path = os.path.join(SNAPSHOT_DIR, re.sub(r'\W+', '_', name) + '.txt')
+        current = snapshot(statements)
+        if os.path.exists(path) and not os.environ.get('UPDATE_PLAN_SNAPSHOTS'):
+            with open(path) as f:
+                recorded = f.read()
+            if recorded != current:
+                changed.append(''.join(difflib.unified_diff(
+                    recorded.splitlines(True), current.splitlines(True), path, 'current plan')))
+            continue
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(current)
+    assert not changed, 'query plans changed, rerun with UPDATE_PLAN_SNAPSHOTS=1 to accept:\n' + '\n'.join(changed)
@@ -0,0 +1,107 @@
+"""
+The read-through cache with the memory backend (the other tests run without a cache, see conftest.py).
+    A write must change every page showing the written rows, and a write of another process, which
+    cannot evict the entries of this one, must reach them through the version stamps.
+"""
+
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def memory_cache():
+    from caching import MemoryCache
+    from settings import cache
+
+    previous = cache.backend
+    cache.backend = MemoryCache()
+    yield cache.backend
+    cache.backend = previous
+
+
+@pytest.fixture
+def booking(client, venue_form, artist_form, last_id):
+    """A venue of an area of its own, an artist, and a show of them"""
+    client.post('/venues/create', data=dict(venue_form, name='The Cached Hall', city='Cachetown'))
+    client.post('/artists/create', data=dict(artist_form, name='The Cached Band'))
+    booking = {'venue_id': last_id('Venue'), 'artist_id': last_id('Artist')}
+    client.post('/shows/create', data=dict(booking, start_time='2034-03-01 20:00'))
+    return booking
+
+
+def _get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    return response.get_data()
+
+
+def _warm(client, memory_cache, urls):
+    """Requests the pages twice, so the second requests are served from the cache"""
+    for url in urls:
+        _get(client, url)
+    hits = memory_cache.stats.hits
+    pages = [_get(client, url) for url in urls]
+    assert memory_cache.stats.hits > hits
+    return pages
+
+
+def test_editing_a_venue_changes_its_pages(client, memory_cache, booking, venue_form):
+    venue_id = booking['venue_id']
+    urls = ['/venues?state=TX&city=Cachetown', '/venues/%d' % venue_id, '/artists/%d' % booking['artist_id']]
+    for page in _warm(client, memory_cache, urls):
+        assert b'The Cached Hall' in page
+
+    client.post('/venues/%d/edit' % venue_id, data=dict(venue_form, name='The Recached Hall', city='Cachetown'))
+
+    for url in urls:
+        page = _get(client, url)
+        assert b'The Recached Hall' in page and b'The Cached Hall' not in page, url
+    response = client.post('/venues/search', data={'search_term': 'recached hall'})
+    assert b'The Recached Hall' in response.data
+
+
+def test_editing_an_artist_changes_its_pages(client, memory_cache, booking, artist_form):
+    artist_id = booking['artist_id']
+    urls = ['/artists/%d' % artist_id, '/venues/%d' % booking['venue_id'], '/shows?artist_id=%d' % artist_id]
+    for page in _warm(client, memory_cache, urls):
+        assert b'The Cached Band' in page
+
+    client.post('/artists/%d/edit' % artist_id, data=dict(artist_form, name='The Recached Band'))
+
+    for url in urls:
+        page = _get(client, url)
+        assert b'The Recached Band' in page and b'The Cached Band' not in page, url
+    response = client.post('/artists/search', data={'search_term': 'recached band'})
+    assert b'The Recached Band' in response.data
+
+
+def test_adding_a_show_changes_its_pages(client, memory_cache, booking):
+    venue_id = booking['venue_id']
+    calendar = '/api/calendar/month?date=2034-03-01&venue_id=%d' % venue_id
+    detail, shows = _warm(client, memory_cache, ['/venues/%d' % venue_id, '/shows?venue_id=%d' % venue_id])
+    assert b'1 Upcoming Show<' in detail
+    assert len(client.get(calendar).get_json()['shows']) == 1
+
+    client.post('/shows/create', data=dict(booking, start_time='2034-03-02 20:00'))
+
+    assert b'2 Upcoming Shows' in _get(client, '/venues/%d' % venue_id)
+    assert _get(client, '/shows?venue_id=%d' % venue_id) != shows
+    assert len(client.get(calendar).get_json()['shows']) == 2
+
+
+def test_a_write_of_another_process_reaches_the_cached_pages(client, engine, memory_cache, booking):
+    venue_id = booking['venue_id']
+    url = '/venues/%d' % venue_id
+    assert b'The Cached Hall' in _warm(client, memory_cache, [url])[0]
+
+    # Another worker renames the venue and bumps its stamp, without touching the entries of this one
+    with engine.begin() as connection:
+        connection.execute(text('UPDATE venues SET name = :name WHERE id = :id'),
+                           {'name': 'The Elsewhere Hall', 'id': venue_id})
+        stamp = {'name': 'venue:%d' % venue_id}
+        connection.execute(text('INSERT INTO version_stamps (name, version) SELECT :name, 0 '
+                                'WHERE NOT EXISTS (SELECT 1 FROM version_stamps WHERE name = :name)'), stamp)
+        connection.execute(text('UPDATE version_stamps SET version = version + 1 WHERE name = :name'), stamp)
+
+    page = _get(client, url)
+    assert b'The Elsewhere Hall' in page and b'The Cached Hall' not in page
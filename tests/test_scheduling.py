@@ -0,0 +1,68 @@
+"""
+Double-booking checks of the show form (see scheduling.py).
+"""
+
+from datetime import datetime
+
+
+def _create(client, path, data):
+    response = client.post(path, data=data)
+    assert b'successfully' in response.data, response.data
+    return response
+
+
+def _show_count(app):
+    import models as app_model
+    from settings import db
+
+    with app.app_context():
+        return db.session.query(app_model.Show).count()
+
+
+def test_non_numeric_ids_are_refused(app, client):
+    shows = _show_count(app)
+    response = client.post('/shows/create', data={'venue_id': 'abc', 'artist_id': '', 'start_time': '2032-01-01 20:00'})
+    assert b'successfully' not in response.data
+    assert b'Please enter a numeric venue ID!' in response.data
+    assert b'This field is required.' in response.data
+    assert _show_count(app) == shows
+
+
+def test_a_conflict_with_a_show_of_a_deleted_venue_is_described(client, venue_form, artist_form, last_id):
+    _create(client, '/venues/create', dict(venue_form, name='The Gone Hall'))
+    gone_venue_id = last_id('Venue')
+    _create(client, '/venues/create', dict(venue_form, name='The Other Hall'))
+    other_venue_id = last_id('Venue')
+    _create(client, '/artists/create', dict(artist_form, name='The Touring Band'))
+    artist_id = last_id('Artist')
+    _create(client, '/shows/create', {'venue_id': gone_venue_id, 'artist_id': artist_id,
+                                      'start_time': '2033-05-01 20:00'})
+    client.get('/venues/%d/delete' % gone_venue_id)
+
+    response = client.post('/shows/create', data={'venue_id': other_venue_id, 'artist_id': artist_id,
+                                                  'start_time': '2033-05-01 21:00'})
+    assert response.status_code == 200
+    assert b'The artist is already playing from 2033-05-01 20:00 to' in response.data
+
+
+def test_the_schedule_is_reloaded_when_another_process_added_a_show_meanwhile(app):
+    import caching
+    import models as app_model
+    import scheduling
+    from settings import cache, db
+
+    show = app_model.Show(id=10 ** 6, venue_id=1, artist_id=1, start_time=datetime(2035, 1, 1, 20),
+                          end_time=datetime(2035, 1, 1, 22))
+    with app.test_request_context():
+        schedule = scheduling.get_schedule(db, cache, app_model)
+        bumped = caching.show_created(cache, show.venue_id, show.artist_id)
+        scheduling.show_added(show, bumped)
+        assert scheduling.get_schedule(db, cache, app_model) is schedule
+        assert schedule.conflict(1, 1, datetime(2035, 1, 1, 21), datetime(2035, 1, 1, 23)) is not None
+
+    with app.test_request_context():
+        schedule = scheduling.get_schedule(db, cache, app_model)
+        # Another worker adds a show between the check of this one and its write
+        cache.bump_versions('shows')
+        scheduling.show_added(show, caching.show_created(cache, show.venue_id, show.artist_id))
+        assert scheduling.get_schedule(db, cache, app_model) is not schedule
@@ -0,0 +1,120 @@
+"""
+Version stamps are shared by every process using the database. A change made by another process,
+here the import-data command, must reach the conditional GETs and the read cache of this one.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ZEBRA = {
+    'name': 'Zebra Lounge', 'city': 'Austin', 'state': 'TX', 'address': '9 Stripe St', 'phone': '512-555-0199',
+    'genres': ['Jazz'], 'seeking_talent': 'false',
+}
+
+
+def import_data(tmp_path, kind, records):
+    """Runs `flask import-data` in a process of its own, like an operator would"""
+    path = tmp_path / ('%s.jsonl' % kind)
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    result = subprocess.run([sys.executable, '-m', 'flask', 'import-data', kind, str(path)], cwd=ROOT,
+                            env=dict(os.environ, FLASK_APP='app'), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'Imported 1 %s' % kind in result.stdout, result.stdout
+
+
+def test_import_from_another_process_changes_the_etag(client, tmp_path):
+    etag = client.get('/venues').headers['ETag']
+    assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 304
+
+    import_data(tmp_path, 'venues', [dict(ZEBRA, name='Zebra Lounge')])
+
+    response = client.get('/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Zebra Lounge' in response.data
+
+
+def test_import_from_another_process_empties_the_memory_cache(app, tmp_path):
+    from caching import MemoryCache
+
+    cache = MemoryCache()
+    with app.test_request_context():
+        cache.set('venues:page', 'before the import')
+        assert cache.get('venues:page') == 'before the import'
+
+    import_data(tmp_path, 'venues', [dict(ZEBRA, name='Zebra Garden')])
+
+    with app.test_request_context():
+        assert cache.get('venues:page') is None
+
+
+def test_a_stamp_bumped_by_another_process_drops_the_entries_of_its_tags(app):
+    from caching import DatabaseStamps, MemoryCache
+
+    cache = MemoryCache()
+    with app.test_request_context():
+        cache.set('venue:1:detail', 'venue 1', tags=['venue:1:detail', 'artist:2'])
+        cache.set('venue:3:detail', 'venue 3', tags=['venue:3:detail'])
+
+    # Outside of a request, like the write of another worker
+    with app.app_context():
+        DatabaseStamps().bump_versions('artist:2')
+
+    with app.test_request_context():
+        assert cache.get('venue:1:detail') is None
+        assert cache.get('venue:3:detail') == 'venue 3'
+
+
+def test_a_value_loaded_while_data_was_written_is_not_stored(app):
+    from caching import DatabaseStamps, MemoryCache
+
+    cache = MemoryCache()
+    with app.app_context():
+        snapshot = cache.snapshot()
+        cache.set('venues:page:1', 'current', tags=['venues:list'], snapshot=snapshot)
+        assert cache.get('venues:page:1') == 'current'
+
+        snapshot = cache.snapshot()
+        DatabaseStamps().bump_versions('shows', 'venue:1')
+        cache.set('venues:page:2', 'maybe without the write', tags=['venues:list'], snapshot=snapshot)
+        assert cache.get('venues:page:2') is None
+
+
+def test_imported_names_reach_the_autocomplete(app, client, tmp_path, monkeypatch):
+    # Check the stamps on every lookup
+    monkeypatch.setitem(app.config, 'AUTOCOMPLETE_STAMP_INTERVAL', 0)
+    assert client.get('/venues/autocomplete?q=zebra c').get_json() == []
+
+    import_data(tmp_path, 'venues', [dict(ZEBRA, name='Zebra Cellar')])
+
+    assert [venue['name'] for venue in client.get('/venues/autocomplete?q=zebra c').get_json()] == ['Zebra Cellar']
+
+
+def test_a_write_of_another_process_between_two_lookups_is_not_lost(app, client):
+    import models as app_model
+    from settings import cache, db
+
+    client.get('/venues/autocomplete?q=zebra')
+    # Another worker adds a venue while this one is about to add its own
+    with app.app_context():
+        db.session.add(app_model.Venue(name='Zebra Annex', city='Austin', state='TX'))
+        db.session.commit()
+        cache.bump_versions('venues')
+    form = dict(ZEBRA, name='Zebra Basement', genres='Jazz', seeking_talent='y', seeking_description='',
+                facebook_link='', image_link='', website_link='')
+    assert b'successfully listed' in client.post('/venues/create', data=form).data
+
+    names = {venue['name'] for venue in client.get('/venues/autocomplete?q=zebra').get_json()}
+    assert {'Zebra Annex', 'Zebra Basement'} <= names
+
+
+def test_imported_names_reach_the_search(client, tmp_path):
+    assert b'Zebra Attic' not in client.post('/venues/search', data={'search_term': 'zebra attic'}).data
+
+    import_data(tmp_path, 'venues', [dict(ZEBRA, name='Zebra Attic')])
+
+    assert b'Zebra Attic' in client.post('/venues/search', data={'search_term': 'zebra attic'}).data
@@ -0,0 +1,685 @@
+"""
+This module contains the views of the app, registered by settings.create_app as the 'main' blueprint.
+    The forms (Flask-WTF and WTForms) and the export module are imported by the views that use
+    them, so that listing-only workers never load them.
+"""
+
+from datetime import date, timedelta
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort, jsonify, Response, get_flashed_messages, stream_with_context
+
+import models as appmod
+import helper_functions as controller_funcs
+import autocomplete
+import caching
+import conditional
+import database
+import formatting
+import instrumentation
+import scheduling
+import search
+
+from settings import db, cache
+
+
+bp = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+
+bp.add_app_template_filter(formatting.format_datetime, 'datetime')
+bp.add_app_template_filter(controller_funcs.parse_genres, 'genres')
+
+
+def page_args():
+    """Reads the keyset pagination arguments (after, before, per_page) of the request"""
+    try:
+        page_size = int(request.args.get('per_page', current_app.config['PAGE_SIZE']))
+    except ValueError:
+        abort(400)
+    return {
+        'page_size': max(1, min(page_size, current_app.config['MAX_PAGE_SIZE'])),
+        'after': request.args.get('after'),
+        'before': request.args.get('before')
+    }
+
+
+def page_url(**changes):
+    """Builds the URL of another page of the current listing, keeping its filters"""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update({key: value for key, value in changes.items() if value is not None})
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+bp.add_app_template_global(page_url)
+
+
+def stream_template(template_name, **context):
+    """Renders a template as a streamed response, so the first bytes leave before the whole page is rendered"""
+    # The session is saved before the body is streamed, so pop the flashed messages now
+    get_flashed_messages()
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(100)
+    return Response(stream_with_context(stream))
+
+
+def autocomplete_response(model):
+    """Answers a type-ahead request (?q=&limit=) with the matching names as JSON, from the in-memory index"""
+    limit = max(1, min(request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int),
+                       current_app.config['SEARCH_RESULT_LIMIT']))
+    index = autocomplete.get_index(db, cache, model, current_app.config['AUTOCOMPLETE_STAMP_INTERVAL'])
+    results = index.lookup(request.args.get('q', ''), limit)
+    response = jsonify(results)
+    response.headers['Cache-Control'] = 'public, max-age=%d' % current_app.config['AUTOCOMPLETE_MAX_AGE']
+    return response
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#----------------------------------------------------------------------------#
+
+@bp.route('/venues')
+@conditional.conditional(cache, lambda: ['venues'])
+def venues():
+    """Venue controller. It shows the registered venues grouped by area, or those of one area (?state=&city=)"""
+    state, city = request.args.get('state'), request.args.get('city')
+    try:
+        if state and city:
+            page = caching.get_area_venues(
+                cache=cache, db=db, app_model=appmod, state=state, city=city, **page_args())
+        else:
+            page = caching.get_venues_by_city_and_state(
+                cache=cache, db=db, app_model=appmod, **page_args(),
+                venues_limit=current_app.config['AREA_VENUES_LIMIT'])
+    except ValueError:
+        abort(400)
+    return stream_template('pages/venues.html', areas=page.items, page=page)
+
+
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+    search_term = request.form.get('search_term', '')
+    response = controller_funcs.search_venue(
+        db=db, app_model=appmod, search_term=search_term,
+        limit=current_app.config['SEARCH_RESULT_LIMIT'], cache=cache)
+    if response['count']:
+        return render_template('pages/search_venues.html', results=response, search_term=search_term)
+    flash("Venue " + str(search_term).upper() +
+          " not found.\nBelow is the list of all available venues.")
+    return venues()
+
+
+@bp.route('/venues/autocomplete')
+def autocomplete_venues():
+    return autocomplete_response(appmod.Venue)
+
+
+@bp.route('/venues/<int:venue_id>')
+@conditional.conditional(cache, lambda venue_id: ['venue:%d' % venue_id, 'artists'])
+def show_venue(venue_id):
+    # Get the details of the venue and its shows
+    venue_data = caching.get_venue_OR_artist_detail(
+        cache=cache, db=db, app_model=appmod, entity_id=venue_id, for_venue_id=True,
+        shows_limit=current_app.config['DETAIL_SHOWS_LIMIT'])
+    if venue_data is None:
+        abort(404)
+    return render_template('pages/show_venue.html', venue=venue_data)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    from forms import VenueForm
+
+    # Get the venue field from the forms
+
+    name = request.form.get('name')
+    city = request.form.get('city')
+    state = request.form.get('state')
+    address = request.form.get('address')
+    phone = request.form.get('phone')
+    genres = request.form.getlist('genres')
+    facebook_link = request.form.get('facebook_link')
+    image_link = request.form.get('image_link')
+    website = request.form.get('website_link')
+    seeking_talent = request.form.get('seeking_talent')
+    seeking_description = request.form.get('seeking_description')
+
+    # Convert form response into boolean field acceptable by the db
+    if seeking_talent == 'y':
+        seeking_talent = True
+    else:
+        seeking_talent = False
+
+    form = VenueForm(request.form)
+    if request.method == 'POST' and form.validate():
+        venue_form_input = appmod.Venue(
+                name=name,
+                city=city,
+                state=state,
+                address=address,
+                phone=phone,
+                facebook_link=facebook_link,
+                image_link=image_link,
+                website=website,
+                seeking_talent=seeking_talent,
+                seeking_description=seeking_description
+            )
+        controller_funcs.set_genres(db, appmod, venue_form_input, genres)
+    else:
+       flash('An error occured. ' + request.form['name'] + ' could not be listed. Please make sure you fill all the required fields correctly.')
+       return render_template('forms/new_venue.html', form=form)
+    try:
+        db.session.add(venue_form_input)
+        db.session.commit()
+        search.mark_stale(appmod.Venue)
+        bumped = caching.venue_created(cache)
+        autocomplete.name_changed(appmod.Venue, venue_form_input.id, venue_form_input.name, bumped)
+        flash('Venue: ' + request.form['name'] + ' was successfully listed!')
+    except Exception as e:
+        flash('An error occured. Venue: ' + request.form['name'] + ' could not be listed')
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<venue_id>/delete', methods=['GET', 'DELETE'])
+def delete_venue(venue_id):
+    error = False
+    try:
+        venue_id_to_delete = appmod.Venue.query.get(venue_id)
+        controller_funcs.update_show_feed(db, appmod, venue=venue_id_to_delete, deleted=True)
+        db.session.delete(venue_id_to_delete)
+        db.session.commit()
+        search.mark_stale(appmod.Venue)
+        bumped = caching.venue_deleted(cache, venue_id)
+        autocomplete.removed(appmod.Venue, int(venue_id), bumped)
+        flash("Successfully deleted Venue with ID = " + venue_id)
+    except:
+        db.session.rollback()
+        error = True
+    finally:
+        db.session.close()
+    if error:
+        flash('There was an error with your delete request')
+        return index()
+    else:
+        return index()
+#  Artists
+# ----------------------------------------------------------------
+
+
+@bp.route('/artists')
+@conditional.conditional(cache, lambda: ['artists'])
+def artists():
+    try:
+        page = caching.get_artist(
+            cache=cache, db=db, app_model=appmod, **page_args())
+    except ValueError:
+        abort(400)
+    return render_template('pages/artists.html', artists=page.items, page=page)
+
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+    search_term = request.form.get('search_term', '')
+    response = controller_funcs.search_artist(
+        db=db, app_model=appmod, search_term=search_term,
+        limit=current_app.config['SEARCH_RESULT_LIMIT'], cache=cache)
+    if response['count']:
+        return render_template('pages/search_artists.html', results=response, search_term=search_term)
+    flash("Artist " + str(search_term).upper() +
+          " not found.\nBelow is the list of all available artists.")
+    return artists()
+
+
+@bp.route('/artists/autocomplete')
+def autocomplete_artists():
+    return autocomplete_response(appmod.Artist)
+
+
+@bp.route('/artists/<int:artist_id>')
+@conditional.conditional(cache, lambda artist_id: ['artist:%d' % artist_id, 'venues'])
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    artist_data = caching.get_venue_OR_artist_detail(
+        cache=cache, db=db, app_model=appmod, entity_id=artist_id, for_artist_id=True,
+        shows_limit=current_app.config['DETAIL_SHOWS_LIMIT'])
+    if artist_data is None:
+        abort(404)
+    return render_template('pages/show_artist.html', artist=artist_data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    from forms import ArtistForm
+
+    form = ArtistForm()
+    artist = db.session.query(appmod.Artist).filter_by(id=artist_id).first()
+
+    # TODO: populate form with fields from artist with ID <artist_id>
+    form.name.data = artist.name
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.genres.data = [genre.name for genre in artist.tagged_genres]
+    form.facebook_link.data = artist.facebook_link
+    form.image_link.data = artist.image_link
+    form.website_link.data = artist.website
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    edited_artist = db.session.query(appmod.Artist).get(artist_id)
+    old_name = edited_artist.name
+
+    edited_artist.name = request.form['name']
+    edited_artist.city = request.form['city']
+    edited_artist.state = request.form['state']
+    edited_artist.phone = request.form['phone']
+    controller_funcs.set_genres(db, appmod, edited_artist, request.form.getlist('genres'))
+    edited_artist.facebook_link = request.form['facebook_link']
+    edited_artist.image_link = request.form['image_link']
+    if request.form.get('seeking_venue') == 'y':
+        edited_artist.seeking_venue = True
+    else:
+        edited_artist.seeking_venue = False
+    edited_artist.website = request.form['website_link']
+
+    edited_artist.seeking_description = request.form['seeking_description']
+
+    controller_funcs.update_show_feed(db, appmod, artist=edited_artist)
+    db.session.commit()
+    search.mark_stale(appmod.Artist)
+    bumped = caching.artist_changed(cache, artist_id, name_changed=edited_artist.name != old_name)
+    autocomplete.name_changed(appmod.Artist, artist_id, edited_artist.name, bumped)
+
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+@bp.route('/artists/<artist_id>/delete', methods=['GET', 'DELETE'])
+def delete_artist(artist_id):
+
+    error = False
+    try:
+        artist_id_to_delete = appmod.Artist.query.get(artist_id)
+        controller_funcs.update_show_feed(db, appmod, artist=artist_id_to_delete, deleted=True)
+        db.session.delete(artist_id_to_delete)
+        db.session.commit()
+        search.mark_stale(appmod.Artist)
+        bumped = caching.artist_deleted(cache, artist_id)
+        autocomplete.removed(appmod.Artist, int(artist_id), bumped)
+        flash("Successfully deleted Artist with ID = " + artist_id)
+    except:
+        db.session.rollback()
+        error = True
+    finally:
+        db.session.close()
+    if error:
+        flash('There was an error with your delete request')
+        return index()
+    else:
+        return index()
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+
+    form = VenueForm()
+    venue = db.session.query(appmod.Venue).filter_by(id=venue_id).one()
+
+    form.name.data = venue.name
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.phone.data = venue.phone
+    form.genres.data = [genre.name for genre in venue.tagged_genres]
+    form.address.data = venue.address
+    form.facebook_link.data = venue.facebook_link
+    form.image_link.data = venue.image_link
+    form.website_link.data = venue.website
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+
+    edited_venue = db.session.query(appmod.Venue).get(venue_id)
+    old_area = (edited_venue.state, edited_venue.city)
+
+    edited_venue.name = request.form['name']
+    edited_venue.city = request.form['city']
+    edited_venue.state = request.form['state']
+    edited_venue.phone = request.form['phone']
+    controller_funcs.set_genres(db, appmod, edited_venue, request.form.getlist('genres'))
+    edited_venue.address = request.form['address']
+    edited_venue.facebook_link = request.form['facebook_link']
+    edited_venue.image_link = request.form['image_link']
+    edited_venue.website = request.form['website_link']
+    edited_venue.seeking_description = request.form['seeking_description']
+    if request.form.get('seeking_talent') == 'y':
+        edited_venue.seeking_talent = True
+    else:
+        edited_venue.seeking_talent = False
+
+    controller_funcs.update_show_feed(db, appmod, venue=edited_venue)
+    db.session.commit()
+    search.mark_stale(appmod.Venue)
+    bumped = caching.venue_changed(cache, venue_id, area_changed=(edited_venue.state, edited_venue.city) != old_area)
+    autocomplete.name_changed(appmod.Venue, venue_id, edited_venue.name, bumped)
+
+    return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    from forms import ArtistForm
+
+    name = request.form.get('name')
+    city = request.form.get('city')
+    state = request.form.get('state')
+    phone = request.form.get('phone')
+    genres = request.form.getlist('genres')
+    facebook_link = request.form.get('facebook_link')
+    image_link = request.form.get('image_link')
+    website = request.form.get('website_link')
+    seeking_venue = request.form.get('seeking_venue')
+    seeking_description = request.form.get('seeking_description')
+
+    if seeking_venue == 'y':
+        seeking_venue = True
+    else:
+        seeking_venue = False
+
+    form = ArtistForm(request.form)
+    if request.method == 'POST' and form.validate():
+        form_artist_input = appmod.Artist(
+                name=name,
+                city=city,
+                state=state,
+                phone=phone,
+                facebook_link=facebook_link,
+                image_link=image_link,
+                website=website,
+                seeking_venue=seeking_venue,
+                seeking_description=seeking_description
+            )
+        controller_funcs.set_genres(db, appmod, form_artist_input, genres)
+    else:
+        flash('An error occured. ' + request.form['name'] + ' could not be listed. Please make sure you fill all the required fields correctly.')
+        return render_template('forms/new_artist.html', form=form)
+    try:
+        db.session.add(form_artist_input)
+        db.session.commit()
+        search.mark_stale(appmod.Artist)
+        bumped = caching.artist_created(cache)
+        autocomplete.name_changed(appmod.Artist, form_artist_input.id, form_artist_input.name, bumped)
+        flash('Artist: ' + request.form['name'] + ' was successfully listed!')
+    except Exception as e:
+        flash('An error occured. Artist: ' + request.form['name'] + ' could not be listed')
+    return render_template('pages/home.html')
+
+
+#  Show
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@conditional.conditional(cache, lambda: ['shows'])
+def shows():
+    # displays list of shows at /shows, optionally only those of a venue or artist,
+    # and only the past or upcoming ones (?when=past|upcoming)
+    upcoming = {'past': False, 'upcoming': True}.get(request.args.get('when'))
+    try:
+        page = caching.get_shows(
+            cache=cache, db=db, app_model=appmod, **page_args(),
+            venue_id=request.args.get('venue_id', type=int),
+            artist_id=request.args.get('artist_id', type=int),
+            upcoming=upcoming)
+    except ValueError:
+        abort(400)
+    return render_template('pages/shows.html', shows=page.items, page=page)
+
+
+def calendar_page(view):
+    """
+        Reads a calendar request (?date=YYYY-MM-DD, venue_id, artist_id, city, state and the page arguments)
+        ----
+        Args
+        ----
+            view (string): 'day', 'week' or 'month'
+        -------
+        Returns
+        -------
+            calendar (dict): The range, its per-day show counts, the filters and a page of its shows
+    """
+    try:
+        day = date.fromisoformat(request.args['date']) if 'date' in request.args else date.today()
+        start, end = controller_funcs.calendar_range(view, day)
+        prev_date = controller_funcs.calendar_range(view, start - timedelta(days=1))[0]
+    except (ValueError, OverflowError):
+        # Not a date, or the period or its neighbours reach past the years 1 to 9999
+        abort(400)
+    filters = {
+        'venue_id': request.args.get('venue_id', type=int),
+        'artist_id': request.args.get('artist_id', type=int),
+        'city': request.args.get('city') or None,
+        'state': request.args.get('state') or None
+    }
+    try:
+        page = caching.get_calendar(cache, db, appmod, start, end, **page_args(), **filters)
+    except ValueError:
+        abort(400)
+    days = caching.get_calendar_day_counts(cache, db, appmod, start, end, **filters)
+    return {
+        'view': view,
+        'start': start,
+        'end': end,
+        'days': days,
+        'filters': filters,
+        'page': page,
+        # The previous and next periods, keeping the filters
+        'prev_date': prev_date,
+        'next_date': end
+    }
+
+
+@bp.route('/calendar', defaults={'view': 'month'})
+@bp.route('/calendar/<any(day, week, month):view>')
+@conditional.conditional(cache, lambda view: ['shows'])
+def calendar(view):
+    # displays the shows of a day, week or month with the number of shows of every day
+    calendar = calendar_page(view)
+    link_args = {key: value for key, value in calendar['filters'].items() if value is not None}
+    return render_template('pages/calendar.html', link_args=link_args, **calendar)
+
+
+@bp.route('/api/calendar/<any(day, week, month):view>')
+@conditional.conditional(cache, lambda view: ['shows'])
+def calendar_api(view):
+    # the same as JSON, for calendar widgets: 'days' alone renders a month
+    calendar = calendar_page(view)
+    page = calendar['page']
+    return jsonify({
+        'view': view,
+        'start': calendar['start'].isoformat(),
+        'end': calendar['end'].isoformat(),
+        'filters': calendar['filters'],
+        'days': calendar['days'],
+        'shows': [dict(show, start_time=show['start_time'].isoformat()) for show in page.items],
+        'next': page_url(after=page.next_cursor) if page.next_cursor else None,
+        'prev': page_url(before=page.prev_cursor) if page.prev_cursor else None
+    })
+
+
+@bp.route('/shows/create')
+def create_shows():
+    from forms import ShowForm
+
+    # Render show forms
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    from forms import ShowForm
+
+    form = ShowForm(request.form)
+    if request.method == 'POST' and form.validate():
+        start_time, end_time = scheduling.slot(form.start_time.data, form.end_time.data)
+        show = appmod.Show(
+            venue_id=int(form.venue_id.data),
+            artist_id=int(form.artist_id.data),
+            start_time=start_time,
+            end_time=end_time
+        )
+    else:
+        flash("Ensure that you use the correct data format")
+        return render_template('forms/new_show.html', form=form)
+    conflict = scheduling.find_conflict(db, cache, appmod, show.venue_id, show.artist_id, start_time, end_time)
+    if conflict is not None:
+        message = scheduling.describe_conflict(*conflict)
+        getattr(form, conflict[0]).errors.append(message)
+        flash(message)
+        return render_template('forms/new_show.html', form=form)
+    try:
+        db.session.add(show)
+        db.session.flush()
+        controller_funcs.refresh_show_feed(db, appmod, show_ids=[show.id])
+        db.session.commit()
+        bumped = caching.show_created(cache, show.venue_id, show.artist_id)
+        scheduling.show_added(show, bumped)
+        flash('Show was successfully created')
+    except Exception as e:
+        flash('An error occured. "SHOW" could not be listed. Ensure that both "Artist" and "Venue" IDs are registered')
+
+    return render_template('pages/home.html')
+
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@bp.route('/genres')
+@conditional.conditional(cache, lambda: ['venues', 'artists'])
+def genres():
+    # lists every genre with its number of venues and artists
+    return render_template('pages/genres.html', genres=controller_funcs.get_genre_counts(db, appmod))
+
+
+def genre_page(genre, for_venues=False, for_artists=False):
+    """Renders the venues or artists of a genre, optionally only those of a state (?state=) or city (?city=)"""
+    state, city = request.args.get('state'), request.args.get('city')
+    try:
+        page = controller_funcs.get_genre_members(
+            db, appmod, genre, **page_args(), for_venues=for_venues, for_artists=for_artists,
+            state=state, city=city)
+    except ValueError:
+        abort(400)
+    if page is None:
+        abort(404)
+    return render_template('pages/genre.html', genre=genre, kind='venues' if for_venues else 'artists',
+                           state=state, city=city, items=page.items, page=page)
+
+
+@bp.route('/genres/<genre>/venues')
+@conditional.conditional(cache, lambda genre: ['venues'])
+def genre_venues(genre):
+    return genre_page(genre, for_venues=True)
+
+
+@bp.route('/genres/<genre>/artists')
+@conditional.conditional(cache, lambda genre: ['artists'])
+def genre_artists(genre):
+    return genre_page(genre, for_artists=True)
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<any(venues, artists, shows):kind>.<any(csv, ndjson):file_format>')
+def export_data(kind, file_format):
+    # Streams a full dump, read from a server-side cursor one batch at a time.
+    # ?gzip=1 downloads a .gz file; otherwise compression.py still gzips the transfer when accepted.
+    import export
+
+    compress = request.args.get('gzip', '') not in ('', '0')
+    filename = '%s.%s%s' % (kind, file_format, '.gz' if compress else '')
+    chunks = export.export_chunks(db, appmod, kind, file_format,
+                                  batch_size=current_app.config['EXPORT_BATCH_SIZE'], compress=compress)
+    response = Response(stream_with_context(chunks),
+                        mimetype='application/gzip' if compress else export.FORMATS[file_format])
+    response.headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+
+#  Diagnostics
+#  ----------------------------------------------------------------
+
+@bp.route('/cache/stats')
+def cache_stats():
+    # Hit and miss counters of this worker's read-through and fragment caches
+    return jsonify(dict(cache.info(), fragments=current_app.jinja_env.fragment_cache.info()))
+
+
+@bp.route('/db/pool')
+def db_pool():
+    # Occupancy and checkout wait times of this worker's connection pools
+    return jsonify(database.pool_info(db, current_app))
+
+
+@bp.route('/instrumentation/requests')
+def instrumentation_summary():
+    # Per endpoint summary of this worker's recent requests, and the flagged ones
+    flagged = [record for record in instrumentation.request_log.records() if record['flagged']]
+    return jsonify(endpoints=instrumentation.request_log.summary(), flagged=flagged[-50:])
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
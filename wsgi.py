@@ -0,0 +1,9 @@
+"""
+The entry point of the web workers, e.g. `gunicorn wsgi:app`.
+    The app is built without the command line modules (Flask-Migrate, Alembic, the import and
+    EXPLAIN commands), which a worker never runs.
+"""
+
+from settings import create_app
+
+app = create_app(cli=False)